@@ -1,8 +1,19 @@
+import csv
+import gzip
+import hashlib
+import hmac
+import math
 import os
-from datetime import date, timedelta
-from functools import wraps
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
 from urllib.parse import parse_qs, unquote, urlparse
 
+import click
 import pymysql
 try:
     import psycopg
@@ -10,10 +21,43 @@ try:
 except Exception:
     psycopg = None
     dict_row = None
-
-from flask import Flask, flash, redirect, render_template, request, session, url_for
+try:
+    import brotli
+except Exception:
+    brotli = None
+
+from flask import (
+    Flask,
+    Response,
+    flash,
+    g,
+    has_request_context,
+    jsonify,
+    message_flashed,
+    redirect,
+    render_template,
+    request,
+    send_from_directory,
+    session,
+    stream_with_context,
+    url_for,
+)
+from markupsafe import Markup
 from werkzeug.security import check_password_hash, generate_password_hash
 
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import migrations
+from assets import VENDOR_ASSETS, AssetManifest, VendorIntegrityError, download_vendor_assets
+from app_cache import MISSING, AppCache, MemoryBackend, RedisBackend
+from db_pool import ConnectionPool
+from member_io import ImportFormatError, MEMBER_FIELDS, csv_chunks, plans_lookup, read_member_rows, validate_member_row
+from metrics import MetricsRegistry, sql_fingerprint
+from qr_code import qr_matrix, render_png, render_svg
+from rate_limit import MemoryBucketStore, RedisBucketStore, TokenBucket
+
 
 def load_env_file(env_path):
     if not os.path.exists(env_path):
@@ -47,6 +91,54 @@ app.config['MYSQL_SSL_DISABLED'] = os.getenv('MYSQL_SSL_DISABLED', '0') == '1'
 app.config['DATABASE_URL'] = os.getenv('DATABASE_URL', os.getenv('SUPABASE_DB_URL', '')).strip()
 app.config['DB_ENGINE'] = 'postgres' if app.config['DATABASE_URL'].lower().startswith(('postgres://', 'postgresql://')) else 'mysql'
 app.config['AUTO_SCHEMA_INIT'] = os.getenv('AUTO_SCHEMA_INIT', '0' if os.getenv('VERCEL') else '1') == '1'
+app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', 'memory').strip().lower()
+app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0').strip()
+app.config['CACHE_DEFAULT_TTL'] = int(os.getenv('CACHE_DEFAULT_TTL', '60'))
+app.config['CACHE_MAX_ENTRIES'] = int(os.getenv('CACHE_MAX_ENTRIES', '512'))
+app.config['SCHEMA_VERSION_CHECK'] = os.getenv('SCHEMA_VERSION_CHECK', '1') == '1'
+app.config['SCHEMA_RECHECK_SECONDS'] = int(os.getenv('SCHEMA_RECHECK_SECONDS', '60'))
+app.config['DB_POOL_MODE'] = os.getenv('DB_POOL_MODE', 'serverless' if os.getenv('VERCEL') else 'pool').strip().lower()
+app.config['DB_POOL_MIN_SIZE'] = int(os.getenv('DB_POOL_MIN_SIZE', '0'))
+app.config['DB_POOL_MAX_SIZE'] = int(os.getenv('DB_POOL_MAX_SIZE', '2' if app.config['DB_POOL_MODE'] == 'serverless' else '10'))
+app.config['DB_POOL_MAX_IDLE'] = int(os.getenv('DB_POOL_MAX_IDLE', '60' if app.config['DB_POOL_MODE'] == 'serverless' else '300'))
+app.config['DB_POOL_MAX_LIFETIME'] = int(os.getenv('DB_POOL_MAX_LIFETIME', '1800'))
+app.config['DB_POOL_TIMEOUT'] = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+app.config['DB_POOL_CHECK_AFTER'] = float(os.getenv('DB_POOL_CHECK_AFTER', '30'))
+app.config['EXPIRY_BATCH_SIZE'] = int(os.getenv('EXPIRY_BATCH_SIZE', '500'))
+app.config['EXPIRY_SCHEDULER'] = os.getenv('EXPIRY_SCHEDULER', '0') == '1' and not os.getenv('VERCEL')
+app.config['EXPIRY_INTERVAL_SECONDS'] = int(os.getenv('EXPIRY_INTERVAL_SECONDS', '3600'))
+app.config['CRON_SECRET'] = os.getenv('CRON_SECRET', '').strip()
+app.config['SESSION_LOG_HOT_MONTHS'] = int(os.getenv('SESSION_LOG_HOT_MONTHS', '12'))
+app.config['SESSION_LOG_RETENTION_MONTHS'] = int(os.getenv('SESSION_LOG_RETENTION_MONTHS', '0'))
+app.config['SESSION_LOG_BATCH_SIZE'] = int(os.getenv('SESSION_LOG_BATCH_SIZE', '1000'))
+app.config['LOGIN_RATE_LIMIT_BACKEND'] = os.getenv('LOGIN_RATE_LIMIT_BACKEND', 'memory').strip().lower()
+app.config['LOGIN_RATE_LIMIT_REDIS_URL'] = os.getenv('LOGIN_RATE_LIMIT_REDIS_URL', app.config['CACHE_REDIS_URL']).strip()
+app.config['LOGIN_IP_ATTEMPTS'] = int(os.getenv('LOGIN_IP_ATTEMPTS', '20'))
+app.config['LOGIN_IP_PERIOD'] = int(os.getenv('LOGIN_IP_PERIOD', '600'))
+app.config['LOGIN_USER_ATTEMPTS'] = int(os.getenv('LOGIN_USER_ATTEMPTS', '5'))
+app.config['LOGIN_USER_PERIOD'] = int(os.getenv('LOGIN_USER_PERIOD', '900'))
+app.config['LOGIN_VERIFY_CACHE_TTL'] = int(os.getenv('LOGIN_VERIFY_CACHE_TTL', '300'))
+app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'scrypt').strip()
+app.config['QR_CACHE_SECONDS'] = int(os.getenv('QR_CACHE_SECONDS', '604800'))
+app.config['AUTH_REVALIDATE_SECONDS'] = int(os.getenv('AUTH_REVALIDATE_SECONDS', '10'))
+app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', '1') == '1'
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN', '').strip()
+app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', '0'))
+app.config['QUERY_BUDGET_MODE'] = os.getenv('QUERY_BUDGET_MODE', '').strip().lower()
+app.config['QUERY_BUDGET_DEFAULT'] = int(os.getenv('QUERY_BUDGET_DEFAULT', '0'))
+app.config['QUERY_REPEAT_LIMIT'] = int(os.getenv('QUERY_REPEAT_LIMIT', '3'))
+app.config['COMPRESS_RESPONSES'] = os.getenv('COMPRESS_RESPONSES', '1') == '1'
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+app.config['COMPRESS_LEVEL'] = int(os.getenv('COMPRESS_LEVEL', '6'))
+app.config['RESPONSE_BUILD_ID'] = os.getenv('VERCEL_GIT_COMMIT_SHA', '').strip() or str(int(time.time()))
+app.config['ASSET_MAX_AGE'] = int(os.getenv('ASSET_MAX_AGE', '31536000'))
+app.config['VENDOR_CDN_FALLBACK'] = os.getenv('VENDOR_CDN_FALLBACK', '1') == '1'
+app.config['TRUST_PROXY_HEADERS'] = os.getenv('TRUST_PROXY_HEADERS', '1' if os.getenv('VERCEL') else '0') == '1'
+app.config['DB_FAN_OUT_WORKERS'] = int(os.getenv('DB_FAN_OUT_WORKERS', '4'))
+app.config['ASYNC_READS'] = os.getenv('ASYNC_READS', '1') == '1'
+app.config['ASYNC_DB_POOL_MAX_SIZE'] = int(os.getenv('ASYNC_DB_POOL_MAX_SIZE', '20'))
+app.config['ASGI_THREADS'] = int(os.getenv('ASGI_THREADS', '16'))
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', str(8 * 1024 * 1024)))
 
 ADMIN_USER = os.getenv('ADMIN_USER', 'admin')
 ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'admin123')
@@ -65,6 +157,115 @@ def format_cop(value):
 
 app.jinja_env.filters['cop'] = format_cop
 
+asset_manifest = AssetManifest(app.static_folder)
+
+
+def asset_url(filename):
+    fingerprinted = asset_manifest.fingerprint(filename)
+    if not fingerprinted:
+        return url_for('static', filename=filename)
+    return url_for('fingerprinted_asset', filename=fingerprinted)
+
+
+def vendor_url(name):
+    filename = asset_manifest.vendor_file(name)
+    if filename:
+        return asset_url(filename)
+    # Sin copia local se usa el CDN con la versión fijada (y el hash SRI si ya hay vendor.lock.json).
+    if app.config['VENDOR_CDN_FALLBACK']:
+        return VENDOR_ASSETS[name][1]
+    app.logger.error('Falta static/%s. Ejecuta "flask assets vendor" y sube los archivos.', VENDOR_ASSETS[name][0])
+    return url_for('static', filename=VENDOR_ASSETS[name][0])
+
+
+def vendor_integrity(name):
+    return asset_manifest.vendor_integrity(name) or ''
+
+
+app.jinja_env.globals.update(asset_url=asset_url, vendor_url=vendor_url, vendor_integrity=vendor_integrity)
+
+
+metrics = MetricsRegistry()
+REQUEST_DURATION = metrics.histogram(
+    'unbroken_request_duration_seconds', 'Duración de las peticiones por ruta.', ('endpoint', 'method', 'status')
+)
+QUERY_DURATION = metrics.histogram(
+    'unbroken_db_query_duration_seconds', 'Duración de las consultas por huella SQL.', ('query',)
+)
+QUERY_ROWS = metrics.counter('unbroken_db_query_rows_total', 'Filas leídas o afectadas por huella SQL.', ('query',))
+CONNECTION_ACQUIRE_DURATION = metrics.histogram(
+    'unbroken_db_connection_acquire_seconds', 'Tiempo para obtener una conexión del pool.'
+)
+
+
+_fan_out_local = threading.local()
+
+
+def current_query_log():
+    if not has_request_context():
+        # Las lecturas en paralelo del panel cuentan en la petición que las lanzó.
+        return getattr(_fan_out_local, 'query_log', None)
+    if query_budget_mode() == 'off':
+        return None
+    return g.setdefault('query_log', [])
+
+
+def observe_query(sql, started, rows):
+    elapsed = time.perf_counter() - started
+    threshold = app.config['SLOW_QUERY_MS']
+    query_log = current_query_log()
+    if not app.config['METRICS_ENABLED'] and not threshold and query_log is None:
+        return
+    fingerprint = sql_fingerprint(sql)
+    if query_log is not None:
+        query_log.append((fingerprint, elapsed))
+    if app.config['METRICS_ENABLED']:
+        QUERY_DURATION.observe(elapsed, query=fingerprint)
+        QUERY_ROWS.inc(max(rows or 0, 0), query=fingerprint)
+    if threshold and elapsed * 1000 >= threshold:
+        endpoint = request.endpoint if has_request_context() else '-'
+        app.logger.warning('Consulta lenta: %.1f ms, %s filas, %s: %s', elapsed * 1000, rows, endpoint, fingerprint)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def query_budget_mode():
+    mode = app.config['QUERY_BUDGET_MODE']
+    if mode in ('off', 'warn', 'raise'):
+        return mode
+    # Sin configurar: falla en pruebas, avisa en desarrollo y no cuenta en producción.
+    if app.testing:
+        return 'raise'
+    return 'warn' if app.debug else 'off'
+
+
+def query_budget(limit=None, allow_repeats=False):
+    def decorator(view):
+        view.query_budget = limit
+        # Las rutas que procesan lotes repiten la misma consulta por elemento a propósito.
+        view.query_repeats_allowed = allow_repeats
+        return view
+
+    return decorator
+
+
+def query_budget_problems(query_log, budget, allow_repeats=False):
+    problems = []
+    if budget and len(query_log) > budget:
+        problems.append(f'{len(query_log)} consultas con un presupuesto de {budget}')
+    if allow_repeats:
+        return problems, {}
+    repeats = {}
+    for fingerprint, _ in query_log:
+        repeats[fingerprint] = repeats.get(fingerprint, 0) + 1
+    for fingerprint, count in repeats.items():
+        if count >= app.config['QUERY_REPEAT_LIMIT']:
+            problems.append(f'posible N+1, {count} veces: {fingerprint}')
+    duplicates = {fingerprint: count for fingerprint, count in repeats.items() if count > 1}
+    return problems, duplicates
+
 
 def is_postgres():
     return app.config.get('DB_ENGINE') == 'postgres'
@@ -90,13 +291,17 @@ def scalar_from_row(row):
     return row[0]
 
 
-def get_db_connection():
+def get_db_connection(autocommit=False):
     if is_postgres():
         if not app.config['DATABASE_URL']:
             raise RuntimeError('DATABASE_URL no configurada para PostgreSQL/Supabase.')
         if psycopg is None:
             raise RuntimeError('Falta instalar psycopg para conectar con Supabase.')
-        return psycopg.connect(app.config['DATABASE_URL'], row_factory=dict_row, connect_timeout=10)
+        connect_kwargs = {'row_factory': dict_row, 'connect_timeout': 10, 'autocommit': autocommit}
+        if app.config['DB_POOL_MODE'] == 'serverless':
+            # Los poolers en modo transacción (Supabase :6543) no soportan sentencias preparadas.
+            connect_kwargs['prepare_threshold'] = None
+        return psycopg.connect(app.config['DATABASE_URL'], **connect_kwargs)
 
     if app.config['MYSQL_URL']:
         parsed = urlparse(app.config['MYSQL_URL'])
@@ -111,7 +316,7 @@ def get_db_connection():
             'database': parsed.path.lstrip('/') or app.config['MYSQL_DB'],
             'port': int(parsed.port or app.config['MYSQL_PORT']),
             'charset': 'utf8mb4',
-            'autocommit': False,
+            'autocommit': autocommit,
             'connect_timeout': 10,
         }
         if not ssl_disabled:
@@ -125,253 +330,521 @@ def get_db_connection():
         database=app.config['MYSQL_DB'],
         port=app.config['MYSQL_PORT'],
         charset='utf8mb4',
-        autocommit=False,
+        autocommit=autocommit,
         connect_timeout=10,
     )
 
 
-def query_all(sql, params=()):
-    conn = get_db_connection()
-    cursor = conn.cursor() if is_postgres() else conn.cursor(pymysql.cursors.DictCursor)
+def ping_connection(conn):
+    if is_postgres():
+        if conn.closed or conn.broken:
+            raise RuntimeError('Conexión PostgreSQL cerrada.')
+        conn.execute('SELECT 1')
+    else:
+        conn.ping(reconnect=False)
+
+
+def reset_connection(conn):
+    if is_postgres():
+        if conn.closed or conn.broken:
+            raise RuntimeError('Conexión PostgreSQL cerrada.')
+        if conn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+            conn.rollback()
+        if not conn.autocommit:
+            conn.autocommit = True
+    elif not conn.get_autocommit():
+        conn.rollback()
+        conn.autocommit(True)
+
+
+_pool_lock = threading.Lock()
+
+
+def get_db_pool():
+    pool = app.extensions.get('db_pool')
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+
+    with _pool_lock:
+        pool = app.extensions.get('db_pool')
+        if pool is None or pool.pid != os.getpid():
+            mode = app.config['DB_POOL_MODE']
+            pool = ConnectionPool(
+                lambda: get_db_connection(autocommit=True),
+                min_size=app.config['DB_POOL_MIN_SIZE'] if mode == 'pool' else 0,
+                max_size=app.config['DB_POOL_MAX_SIZE'],
+                max_idle=0 if mode == 'off' else app.config['DB_POOL_MAX_IDLE'],
+                max_lifetime=app.config['DB_POOL_MAX_LIFETIME'],
+                timeout=app.config['DB_POOL_TIMEOUT'],
+                check_after=app.config['DB_POOL_CHECK_AFTER'],
+                ping=ping_connection,
+                reset=reset_connection,
+            )
+            app.extensions['db_pool'] = pool
+    return pool
+
+
+def acquire_connection():
+    started = time.perf_counter()
+    conn = get_db_pool().acquire()
+    if app.config['METRICS_ENABLED']:
+        CONNECTION_ACQUIRE_DURATION.observe(time.perf_counter() - started)
+    return conn
+
+
+def release_connection(conn, discard=False):
+    get_db_pool().release(conn, discard=discard)
+
+
+def dict_cursor(conn):
+    return conn.cursor() if is_postgres() else conn.cursor(pymysql.cursors.DictCursor)
+
+
+class UnitOfWork:
+    def __init__(self):
+        self.conn = None
+        self.in_transaction = False
+        self.failed = False
+        self.pending_invalidations = set()
+
+    def connection(self):
+        if self.conn is None:
+            self.conn = acquire_connection()
+        return self.conn
+
+    def begin(self):
+        if self.in_transaction:
+            return
+        conn = self.connection()
+        if is_postgres():
+            conn.autocommit = False
+        else:
+            conn.begin()
+        self.in_transaction = True
+
+    def _end(self):
+        self.in_transaction = False
+        if is_postgres():
+            self.conn.autocommit = True
+
+    def commit(self):
+        if self.in_transaction:
+            self.conn.commit()
+            self._end()
+
+    def rollback(self):
+        if self.in_transaction:
+            try:
+                self.conn.rollback()
+                self._end()
+            except Exception:
+                self.in_transaction = False
+                self.failed = True
+
+    def close(self):
+        if self.conn is None:
+            return
+        self.rollback()
+        release_connection(self.conn, discard=self.failed)
+        self.conn = None
+
+
+_local_unit = threading.local()
+
+
+def current_unit():
+    if has_request_context():
+        return g.get('db_unit')
+    return getattr(_local_unit, 'unit', None)
+
+
+def request_unit():
+    unit = g.get('db_unit')
+    if unit is None:
+        unit = UnitOfWork()
+        g.db_unit = unit
+    return unit
+
+
+@contextmanager
+def transaction():
+    unit = request_unit() if has_request_context() else current_unit()
+    if unit is not None:
+        unit.begin()
+        yield unit.connection()
+        return
+
+    unit = UnitOfWork()
+    _local_unit.unit = unit
+    try:
+        unit.begin()
+        yield unit.connection()
+        unit.commit()
+    except Exception:
+        unit.rollback()
+        raise
+    finally:
+        _local_unit.unit = None
+        unit.close()
+    if unit.pending_invalidations:
+        publish_invalidations(unit.pending_invalidations)
+
+
+@contextmanager
+def chunk_transaction():
+    if not has_request_context():
+        with transaction() as conn:
+            yield conn
+        return
+
+    # Dentro de una petición cada bloque se confirma por separado.
+    unit = request_unit()
+    unit.begin()
+    try:
+        yield unit.connection()
+        unit.commit()
+    except Exception:
+        unit.rollback()
+        raise
+
+
+def run_with_connection(operation, write=False):
+    unit = request_unit() if has_request_context() else current_unit()
+    if unit is None:
+        conn = acquire_connection()
+        try:
+            result = operation(conn)
+        except Exception:
+            release_connection(conn, discard=True)
+            raise
+        release_connection(conn)
+        return result
+
+    if write:
+        unit.begin()
+    try:
+        return operation(unit.connection())
+    except Exception:
+        unit.failed = True
+        raise
+
+
+def timed_execute(cursor, sql, params=()):
+    started = time.perf_counter()
     cursor.execute(sql, params)
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return rows
+    observe_query(sql, started, cursor.rowcount)
+
+
+def get_fan_out_executor():
+    executor = app.extensions.get('fan_out_executor')
+    if executor is None:
+        with _pool_lock:
+            executor = app.extensions.get('fan_out_executor')
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=app.config['DB_FAN_OUT_WORKERS'], thread_name_prefix='db-fan-out')
+                app.extensions['fan_out_executor'] = executor
+    return executor
+
+
+def capture(call):
+    try:
+        return call(), None
+    except Exception as error:
+        return None, error
+
+
+def fan_out(calls):
+    # Devuelve {nombre: (resultado, error)}; cada lectura usa su propia conexión del pool.
+    unit = current_unit()
+    workers = min(app.config['DB_FAN_OUT_WORKERS'], app.config['DB_POOL_MAX_SIZE'])
+    if workers < 2 or len(calls) < 2 or (unit is not None and unit.in_transaction):
+        return {name: capture(call) for name, call in calls.items()}
+
+    if unit is not None:
+        # Sin esto, peticiones que retienen su conexión mientras esperan podrían agotar el pool.
+        unit.close()
+    query_log = current_query_log()
+
+    def run(call):
+        _fan_out_local.query_log = query_log
+        try:
+            return capture(call)
+        finally:
+            _fan_out_local.query_log = None
+
+    executor = get_fan_out_executor()
+    futures = {name: executor.submit(run, call) for name, call in calls.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def query_all(sql, params=()):
+    def operation(conn):
+        started = time.perf_counter()
+        cursor = dict_cursor(conn)
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        observe_query(sql, started, len(rows))
+        return rows
+
+    return run_with_connection(operation)
 
 
 def query_one(sql, params=()):
-    conn = get_db_connection()
-    cursor = conn.cursor() if is_postgres() else conn.cursor(pymysql.cursors.DictCursor)
-    cursor.execute(sql, params)
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    return row
+    def operation(conn):
+        started = time.perf_counter()
+        cursor = dict_cursor(conn)
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+        cursor.close()
+        observe_query(sql, started, 1 if row else 0)
+        return row
 
+    return run_with_connection(operation)
 
-def execute(sql, params=()):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    normalized_sql = sql.strip().lower()
-    needs_returning_id = is_postgres() and normalized_sql.startswith('insert into') and 'returning' not in normalized_sql
-    sql_to_run = f"{sql.rstrip().rstrip(';')} RETURNING id" if needs_returning_id else sql
-    cursor.execute(sql_to_run, params)
-
-    last_id = None
-    if needs_returning_id:
-        inserted = cursor.fetchone()
-        if isinstance(inserted, dict):
-            last_id = inserted.get('id')
-        elif inserted:
-            last_id = inserted[0]
-
-    conn.commit()
-    if last_id is None:
-        last_id = getattr(cursor, 'lastrowid', None)
-    row_count = cursor.rowcount if cursor.rowcount is not None else 0
-    cursor.close()
-    conn.close()
-    return last_id, row_count
 
+def execute(sql, params=(), returning_id=True):
+    def operation(conn):
+        started = time.perf_counter()
+        cursor = conn.cursor()
+        normalized_sql = sql.strip().lower()
+        needs_returning_id = (
+            returning_id
+            and is_postgres()
+            and normalized_sql.startswith('insert into')
+            and 'returning' not in normalized_sql
+        )
+        sql_to_run = f"{sql.rstrip().rstrip(';')} RETURNING id" if needs_returning_id else sql
+        cursor.execute(sql_to_run, params)
+
+        last_id = None
+        if needs_returning_id:
+            inserted = cursor.fetchone()
+            if isinstance(inserted, dict):
+                last_id = inserted.get('id')
+            elif inserted:
+                last_id = inserted[0]
+
+        if last_id is None:
+            last_id = getattr(cursor, 'lastrowid', None)
+        row_count = cursor.rowcount if cursor.rowcount is not None else 0
+        cursor.close()
+        observe_query(sql, started, row_count)
+        return last_id, row_count
 
-def current_role():
-    return session.get('user_role', '')
+    return run_with_connection(operation, write=True)
 
 
-def ensure_schema():
-    if app.config.get('SCHEMA_READY'):
+def execute_returning(sql, params=()):
+    def operation(conn):
+        started = time.perf_counter()
+        cursor = dict_cursor(conn)
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+        cursor.close()
+        observe_query(sql, started, 1 if row else 0)
+        return row
+
+    return run_with_connection(operation, write=True)
+
+
+def get_cache():
+    cache = app.extensions.get('app_cache')
+    if cache is None:
+        backend_name = app.config['CACHE_BACKEND']
+        if backend_name == 'redis':
+            backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        else:
+            backend = MemoryBackend(max_entries=app.config['CACHE_MAX_ENTRIES'])
+        cache = AppCache(backend, default_ttl=app.config['CACHE_DEFAULT_TTL'], enabled=backend_name != 'none')
+        app.extensions['app_cache'] = cache
+    return cache
+
+
+def cached(key, loader, ttl=None, tags=()):
+    return get_cache().get_or_set(key, loader, ttl=ttl, tags=tags)
+
+
+def invalidate_cache(*tags):
+    unit = current_unit()
+    if unit is not None and unit.in_transaction:
+        # Se publica después del commit: no se vuelve a cachear datos sin confirmar
+        # y la transacción no retiene las filas de gym_data_versions.
+        unit.pending_invalidations.update(tags)
         return
+    publish_invalidations(tags)
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    if is_postgres():
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS gym_plans (
-                id SERIAL PRIMARY KEY,
-                name VARCHAR(120) NOT NULL,
-                sessions_per_month INT NOT NULL,
-                price NUMERIC(10, 2) NOT NULL DEFAULT 0,
-                is_active BOOLEAN NOT NULL DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS gym_members (
-                id SERIAL PRIMARY KEY,
-                full_name VARCHAR(180) NOT NULL,
-                document VARCHAR(50) NOT NULL UNIQUE,
-                phone VARCHAR(50),
-                email VARCHAR(120),
-                injuries TEXT,
-                conditions_text TEXT,
-                emergency_contact_name VARCHAR(180),
-                emergency_contact_phone VARCHAR(50),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS gym_subscriptions (
-                id SERIAL PRIMARY KEY,
-                member_id INT NOT NULL,
-                plan_id INT NOT NULL,
-                start_date DATE NOT NULL,
-                end_date DATE NOT NULL,
-                remaining_sessions INT NOT NULL,
-                status VARCHAR(20) NOT NULL DEFAULT 'active',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                CONSTRAINT fk_sub_member FOREIGN KEY (member_id) REFERENCES gym_members(id),
-                CONSTRAINT fk_sub_plan FOREIGN KEY (plan_id) REFERENCES gym_plans(id)
-            )
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS gym_admins (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(120) NOT NULL UNIQUE,
-                password_hash VARCHAR(255) NOT NULL,
-                is_active BOOLEAN NOT NULL DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS gym_session_logs (
-                id SERIAL PRIMARY KEY,
-                member_id INT NULL,
-                member_document VARCHAR(50),
-                member_name VARCHAR(180),
-                subscription_id INT NULL,
-                action VARCHAR(40) NOT NULL,
-                remaining_before INT NULL,
-                remaining_after INT NULL,
-                performed_by VARCHAR(120) NOT NULL,
-                performed_role VARCHAR(20) NOT NULL,
-                notes VARCHAR(255),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
-        cursor.execute("ALTER TABLE gym_admins ADD COLUMN IF NOT EXISTS role VARCHAR(20) NOT NULL DEFAULT 'admin'")
-    else:
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS gym_plans (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(120) NOT NULL,
-                sessions_per_month INT NOT NULL,
-                price DECIMAL(10, 2) NOT NULL DEFAULT 0,
-                is_active TINYINT(1) NOT NULL DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS gym_members (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                full_name VARCHAR(180) NOT NULL,
-                document VARCHAR(50) NOT NULL UNIQUE,
-                phone VARCHAR(50),
-                email VARCHAR(120),
-                injuries TEXT,
-                conditions_text TEXT,
-                emergency_contact_name VARCHAR(180),
-                emergency_contact_phone VARCHAR(50),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS gym_subscriptions (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                member_id INT NOT NULL,
-                plan_id INT NOT NULL,
-                start_date DATE NOT NULL,
-                end_date DATE NOT NULL,
-                remaining_sessions INT NOT NULL,
-                status VARCHAR(20) NOT NULL DEFAULT 'active',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                CONSTRAINT fk_sub_member FOREIGN KEY (member_id) REFERENCES gym_members(id),
-                CONSTRAINT fk_sub_plan FOREIGN KEY (plan_id) REFERENCES gym_plans(id)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS gym_admins (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(120) NOT NULL UNIQUE,
-                password_hash VARCHAR(255) NOT NULL,
-                is_active TINYINT(1) NOT NULL DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS gym_session_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                member_id INT NULL,
-                member_document VARCHAR(50),
-                member_name VARCHAR(180),
-                subscription_id INT NULL,
-                action VARCHAR(40) NOT NULL,
-                remaining_before INT NULL,
-                remaining_after INT NULL,
-                performed_by VARCHAR(120) NOT NULL,
-                performed_role VARCHAR(20) NOT NULL,
-                notes VARCHAR(255),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-            """
-        )
-        cursor.execute(
-            """
-            SELECT COUNT(*)
-            FROM information_schema.COLUMNS
-            WHERE TABLE_SCHEMA = %s
-              AND TABLE_NAME = 'gym_admins'
-              AND COLUMN_NAME = 'role'
+
+def publish_invalidations(tags):
+    tags = set(tags)
+    try:
+        bump_data_versions(tags)
+    except Exception:
+        app.logger.exception('No se pudo actualizar la versión de los datos: %s.', ', '.join(sorted(tags)))
+    get_cache().invalidate(*tags)
+
+
+def schema_is_current():
+    # Con SCHEMA_VERSION_CHECK=0, en la consola y en hilos de fondo no pasa check_schema; se consulta aquí.
+    if not app.config.get('SCHEMA_READY'):
+        now = time.monotonic()
+        if now < app.config.get('SCHEMA_NEXT_CHECK', 0):
+            return False
+        try:
+            app.config['SCHEMA_READY'] = schema_version() >= migrations.LATEST_VERSION
+        except Exception:
+            app.config['SCHEMA_READY'] = False
+        if not app.config['SCHEMA_READY']:
+            app.config['SCHEMA_NEXT_CHECK'] = now + app.config['SCHEMA_RECHECK_SECONDS']
+    return bool(app.config.get('SCHEMA_READY'))
+
+
+def bump_data_versions(tags):
+    names = sorted(set(tags) & set(migrations.DATA_VERSION_NAMES))
+    if not names or not schema_is_current():
+        return
+    # Transacción corta y en orden fijo (por nombre) para que dos escrituras no se bloqueen en cruce.
+    with chunk_transaction():
+        execute(
+            f"""
+            UPDATE gym_data_versions
+            SET version = version + 1, changed_at = CURRENT_TIMESTAMP
+            WHERE name IN ({', '.join(['%s'] * len(names))})
             """,
-            (app.config['MYSQL_DB'],),
-        )
-        role_column_exists = scalar_from_row(cursor.fetchone()) > 0
-        if not role_column_exists:
-            cursor.execute("ALTER TABLE gym_admins ADD COLUMN role VARCHAR(20) NOT NULL DEFAULT 'admin' AFTER password_hash")
-
-    cursor.execute("UPDATE gym_admins SET role = 'admin' WHERE role IS NULL OR role = ''")
-    cursor.execute('SELECT COUNT(*) FROM gym_plans')
-    plans_count = scalar_from_row(cursor.fetchone())
-    if plans_count == 0:
-        cursor.execute(
-            """
-            INSERT INTO gym_plans (name, sessions_per_month, price)
-            VALUES
-                ('Plan Básico', 8, 80.00),
-                ('Plan Intermedio', 12, 120.00),
-                ('Plan Full', 20, 180.00)
-            """
+            names,
         )
 
+
+def data_versions_sql(names):
+    return f"SELECT name, version, changed_at FROM gym_data_versions WHERE name IN ({', '.join(['%s'] * len(names))})"
+
+
+def load_data_versions(names):
+    return query_all(data_versions_sql(names), list(names))
+
+
+def wants_validator():
+    return request.method == 'GET' and schema_is_current() and not session.get('_flashes')
+
+
+def response_validator(tags, rows=None):
+    if rows is None:
+        if not wants_validator():
+            return None
+        try:
+            rows = load_data_versions(tags)
+        except Exception:
+            return None
+    stamp = ','.join(f"{row['name']}:{row['version']}" for row in sorted(rows, key=lambda row: row['name']))
+    parts = (
+        app.config['RESPONSE_BUILD_ID'],
+        request.full_path,
+        session.get('admin_user', ''),
+        current_role(),
+        date.today().isoformat(),
+        stamp,
+    )
+    etag = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    last_modified = max((row['changed_at'] for row in rows if row['changed_at']), default=None)
+    return etag, last_modified
+
+
+def set_validator(response, validator):
+    etag, last_modified = validator
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def not_modified(validator):
+    if not request.if_none_match.contains_weak(validator[0]):
+        return None
+    return set_validator(app.response_class(status=304), validator)
+
+
+def validated_response(rv, validator):
+    response = app.make_response(rv)
+    # Una página en modo limitado (con aviso) no debe quedar como versión válida.
+    if response.status_code != 200 or g.get('response_flashed'):
+        return response
+    return set_validator(response, validator)
+
+
+def conditional_view(*tags):
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            validator = response_validator(tags)
+            if validator is None:
+                return view(*args, **kwargs)
+            response = not_modified(validator)
+            if response is None:
+                response = validated_response(view(*args, **kwargs), validator)
+            return response
+
+        wrapped.validator_tags = tags
+        return wrapped
+
+    return decorator
+
+
+@message_flashed.connect_via(app)
+def mark_response_flashed(sender, message, category, **extra):
+    g.response_flashed = True
+
+
+def active_plans_sql():
+    return f'SELECT id, name, sessions_per_month, price FROM gym_plans WHERE is_active = {sql_true()} ORDER BY name'
+
+
+def active_plans():
+    return cached('plans:active', lambda: query_all(active_plans_sql()), ttl=300, tags=('plans',))
+
+
+def current_role():
+    return session.get('user_role', '')
+
+
+def hash_password(password):
+    return generate_password_hash(password, method=app.config['PASSWORD_HASH_METHOD'])
+
+
+def password_needs_rehash(password_hash):
+    current = app.extensions.get('password_hash_prefix')
+    if current is None:
+        current = hash_password('').split('$', 1)[0]
+        app.extensions['password_hash_prefix'] = current
+    return password_hash.split('$', 1)[0] != current
+
+
+def verify_password(password_hash, password):
+    ttl = app.config['LOGIN_VERIFY_CACHE_TTL']
+    if ttl <= 0:
+        return check_password_hash(password_hash, password)
+
+    verified = app.extensions.get('login_verify_cache')
+    if verified is None:
+        verified = app.extensions.setdefault('login_verify_cache', MemoryBackend(max_entries=256))
+    # La clave depende del hash guardado: un cambio de contraseña invalida la entrada.
+    key = hmac.new(app.secret_key.encode(), f'{password_hash}\0{password}'.encode(), 'sha256').hexdigest()
+    if verified.get(key) is not MISSING:
+        return True
+    if not check_password_hash(password_hash, password):
+        return False
+    verified.set(key, True, ttl)
+    return True
+
+
+def seed_env_admin(cursor):
     cursor.execute('SELECT COUNT(*) FROM gym_admins')
     admins_count = scalar_from_row(cursor.fetchone())
     if admins_count == 0:
         cursor.execute(
             'INSERT INTO gym_admins (username, password_hash, role, is_active) VALUES (%s, %s, %s, %s)',
-            (ADMIN_USER, generate_password_hash(ADMIN_PASSWORD), 'admin', active_value()),
+            (ADMIN_USER, hash_password(ADMIN_PASSWORD), 'admin', active_value()),
         )
     else:
         cursor.execute('SELECT id FROM gym_admins WHERE username = %s', (ADMIN_USER,))
@@ -379,21 +852,298 @@ def ensure_schema():
         if not env_admin:
             cursor.execute(
                 'INSERT INTO gym_admins (username, password_hash, role, is_active) VALUES (%s, %s, %s, %s)',
-                (ADMIN_USER, generate_password_hash(ADMIN_PASSWORD), 'admin', active_value()),
+                (ADMIN_USER, hash_password(ADMIN_PASSWORD), 'admin', active_value()),
             )
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+
+def ensure_schema():
+    if app.config.get('SCHEMA_READY'):
+        return []
+
+    conn = get_db_connection()
+    try:
+        applied = migrations.upgrade(conn, app.config['DB_ENGINE'], log=app.logger.info)
+        cursor = conn.cursor()
+        seed_env_admin(cursor)
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
     app.config['SCHEMA_READY'] = True
+    return applied
+
+
+def schema_version():
+    row = query_one('SELECT MAX(version) AS version FROM schema_migrations')
+    return (row['version'] or 0) if row else 0
+
+
+def check_schema():
+    now = time.monotonic()
+    if now < app.config.get('SCHEMA_NEXT_CHECK', 0):
+        return
+
+    try:
+        current = schema_version()
+    except Exception:
+        current = None
+
+    if current is not None and current >= migrations.LATEST_VERSION:
+        app.config['SCHEMA_READY'] = True
+        return
+
+    if app.config.get('AUTO_SCHEMA_INIT'):
+        try:
+            ensure_schema()
+            return
+        except Exception:
+            app.logger.exception('No se pudo aplicar las migraciones pendientes.')
+    elif current is not None:
+        app.logger.warning(
+            'El esquema está en la versión %s y la aplicación espera la %s. Ejecuta "flask db upgrade".',
+            current,
+            migrations.LATEST_VERSION,
+        )
+    else:
+        app.logger.warning('No se pudo leer la versión del esquema. Ejecuta "flask db upgrade".')
+    app.config['SCHEMA_NEXT_CHECK'] = now + app.config['SCHEMA_RECHECK_SECONDS']
+
+
+@app.cli.group('db')
+def db_cli():
+    """Migraciones del esquema de base de datos."""
+
+
+@db_cli.command('upgrade')
+def db_upgrade_command():
+    """Aplica las migraciones pendientes y crea el admin de .env."""
+    app.config['SCHEMA_READY'] = False
+    applied = ensure_schema()
+    if applied:
+        click.echo(f"Migraciones aplicadas: {', '.join(str(version) for version in applied)}.")
+    else:
+        click.echo('El esquema ya estaba actualizado.')
+    click.echo(f'Versión actual: {migrations.LATEST_VERSION}.')
+
+
+@db_cli.command('backfill-rollups')
+def db_backfill_rollups_command():
+    """Recalcula los agregados de actividad desde el historial completo."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        migrations.backfill_rollups(cursor, app.config['DB_ENGINE'])
+        cursor.close()
+    click.echo('Agregados de actividad recalculados.')
+
+
+@db_cli.command('status')
+def db_status_command():
+    """Muestra la versión del esquema y las migraciones pendientes."""
+    try:
+        current = schema_version()
+    except Exception:
+        current = 0
+    click.echo(f'Versión actual: {current}. Versión esperada: {migrations.LATEST_VERSION}.')
+    for version, description, _ in migrations.MIGRATIONS:
+        if version > current:
+            click.echo(f'  pendiente {version:04d}: {description}')
+
+
+@app.cli.group('assets')
+def assets_cli():
+    """Archivos estáticos y librerías de terceros."""
+
+
+@assets_cli.command('vendor')
+def assets_vendor_command():
+    """Descarga a static/vendor las librerías fijadas en VENDOR_ASSETS."""
+    try:
+        downloaded = download_vendor_assets(app.static_folder)
+    except (OSError, VendorIntegrityError) as error:
+        raise click.ClickException(f'No se pudo descargar: {error}')
+    for name, filename, size, integrity in downloaded:
+        click.echo(f'{name}: static/{asset_manifest.fingerprint(filename)} ({size} bytes, {integrity})')
+
+
+@assets_cli.command('check')
+def assets_check_command():
+    """Falla si falta alguna librería de static/vendor o no coincide con su hash."""
+    missing = asset_manifest.missing_vendor_files()
+    if missing:
+        raise click.ClickException(
+            f"Faltan o no coinciden: {', '.join(missing)}. Ejecuta \"flask assets vendor\" y sube app/static/vendor."
+        )
+    click.echo('Librerías locales completas.')
+
+
+@app.cli.group('members')
+def members_cli():
+    """Operaciones masivas sobre miembros."""
+
+
+@members_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def members_import_command(path):
+    """Importa miembros desde un CSV o XLSX."""
+    with open(path, 'rb') as stream:
+        try:
+            report = import_members(read_member_rows(stream, path), active_plans())
+        except ImportFormatError as error:
+            raise click.ClickException(str(error))
+    click.echo(
+        f"Filas: {report['processed']}. Nuevos: {report['created']}. "
+        f"Actualizados: {report['updated']}. Con errores: {report['error_count']}."
+    )
+    for error in report['errors']:
+        click.echo(f"  línea {error['line']}: {error['message']}")
+
+
+@app.cli.group('subscriptions')
+def subscriptions_cli():
+    """Tareas periódicas de suscripciones."""
+
+
+@subscriptions_cli.command('expire')
+@click.option('--batch-size', type=int, default=None, help='Filas por transacción.')
+def subscriptions_expire_command(batch_size):
+    """Marca como vencidas las suscripciones activas con fecha de fin pasada."""
+    expired = expire_subscriptions(batch_size=batch_size)
+    click.echo(f'Suscripciones vencidas: {expired}.')
+
+
+@app.cli.group('session-logs')
+def session_logs_cli():
+    """Archivo y retención del registro de sesiones."""
+
+
+@session_logs_cli.command('archive')
+@click.option('--months', type=int, default=None, help='Meses que se mantienen en la tabla principal.')
+@click.option('--batch-size', type=int, default=None, help='Filas por transacción.')
+def session_logs_archive_command(months, batch_size):
+    """Mueve al archivo los registros anteriores a los meses recientes."""
+    months = app.config['SESSION_LOG_HOT_MONTHS'] if months is None else months
+    before = months_ago(months)
+    moved = archive_session_logs(before, batch_size=batch_size)
+    click.echo(f'Registros archivados (anteriores a {before.isoformat()}): {moved}.')
+
+    retention = app.config['SESSION_LOG_RETENTION_MONTHS']
+    if retention:
+        purge_before = months_ago(retention)
+        purged = purge_archived_session_logs(purge_before, batch_size=batch_size)
+        click.echo(f'Registros eliminados del archivo (anteriores a {purge_before.isoformat()}): {purged}.')
+
+
+@session_logs_cli.command('export')
+@click.argument('month')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Archivo .csv.gz de salida.')
+def session_logs_export_command(month, output):
+    """Exporta un mes archivado (AAAA-MM) a CSV comprimido."""
+    try:
+        month_start = datetime.strptime(month, '%Y-%m').date()
+    except ValueError:
+        raise click.BadParameter('Usa el formato AAAA-MM.', param_hint='MONTH')
+    output = output or f'session-logs-{month}.csv.gz'
+    exported = export_archived_month(month_start, output)
+    click.echo(f'Registros exportados a {output}: {exported}.')
+
+
+@session_logs_cli.command('purge')
+@click.option('--months', type=int, required=True, help='Meses de archivo que se conservan.')
+@click.option('--batch-size', type=int, default=None, help='Filas por transacción.')
+def session_logs_purge_command(months, batch_size):
+    """Elimina del archivo los registros anteriores a los meses indicados."""
+    before = months_ago(months)
+    purged = purge_archived_session_logs(before, batch_size=batch_size)
+    click.echo(f'Registros eliminados del archivo (anteriores a {before.isoformat()}): {purged}.')
+
+
+def wants_json():
+    return request.path.startswith('/api/')
+
+
+ACCOUNT_STATES_SQL = 'SELECT username, role, is_active, auth_epoch FROM gym_admins'
+
+
+def load_account_states():
+    return account_states(query_all(ACCOUNT_STATES_SQL))
+
+
+def account_states(rows):
+    return {
+        row['username']: {'role': row['role'], 'active': bool(row['is_active']), 'epoch': row['auth_epoch']}
+        for row in rows
+    }
+
+
+def account_state(username):
+    states = cached('auth:accounts', load_account_states, ttl=app.config['AUTH_REVALIDATE_SECONDS'], tags=('admins',))
+    state = states.get(username)
+    if state is None:
+        # Puede ser una cuenta recién creada en otra instancia: se consulta directo.
+        row = query_one('SELECT role, is_active, auth_epoch FROM gym_admins WHERE username = %s', (username,))
+        if row:
+            state = {'role': row['role'], 'active': bool(row['is_active']), 'epoch': row['auth_epoch']}
+    return state
+
+
+def session_is_current():
+    if 'session_current' in g:
+        return g.session_current
+
+    username = session.get('admin_user')
+    current = True
+    if username != ADMIN_USER:
+        try:
+            state = account_state(username)
+        except Exception:
+            # Sin base de datos se conserva la sesión; las vistas ya manejan ese caso.
+            app.logger.exception('No se pudo revalidar la sesión de %s.', username)
+        else:
+            current = bool(state and state['active'] and state['epoch'] == session.get('auth_epoch', state['epoch']))
+            if current:
+                refreshed = {'auth_epoch': state['epoch'], 'user_role': state['role'], 'is_admin': state['role'] == 'admin'}
+                for key, value in refreshed.items():
+                    if session.get(key) != value:
+                        session[key] = value
+    g.session_current = current
+    return current
+
+
+def bump_auth_epoch(user_id):
+    execute('UPDATE gym_admins SET auth_epoch = auth_epoch + 1 WHERE id = %s', (user_id,))
+    invalidate_cache('admins')
+
+
+def reject_stale_session():
+    session.clear()
+    if wants_json():
+        return jsonify({'ok': False, 'error': 'Tu sesión ya no es válida. Inicia sesión de nuevo.'}), 401
+    flash('Tu sesión ya no es válida. Inicia sesión de nuevo.', 'danger')
+    return redirect(url_for('index'))
+
+
+def auth_error(admin=False):
+    if not session.get('is_authenticated'):
+        if wants_json():
+            return jsonify({'ok': False, 'error': 'Debes iniciar sesión.'}), 401
+        flash('Debes iniciar sesión.', 'danger')
+        return redirect(url_for('index'))
+    if not session_is_current():
+        return reject_stale_session()
+    if admin and current_role() != 'admin':
+        if wants_json():
+            return jsonify({'ok': False, 'error': 'No tienes permisos para esta acción.'}), 403
+        flash('No tienes permisos para esta acción.', 'danger')
+        return redirect(url_for('dashboard'))
+    return None
 
 
 def login_required(view):
     @wraps(view)
     def wrapped(*args, **kwargs):
-        if not session.get('is_authenticated'):
-            flash('Debes iniciar sesión.', 'danger')
-            return redirect(url_for('index'))
+        error = auth_error()
+        if error is not None:
+            return error
         return view(*args, **kwargs)
     return wrapped
 
@@ -401,48 +1151,267 @@ def login_required(view):
 def admin_required(view):
     @wraps(view)
     def wrapped(*args, **kwargs):
-        if not session.get('is_authenticated'):
-            flash('Debes iniciar sesión.', 'danger')
-            return redirect(url_for('index'))
-        if current_role() != 'admin':
-            flash('No tienes permisos para esta acción.', 'danger')
-            return redirect(url_for('dashboard'))
+        error = auth_error(admin=True)
+        if error is not None:
+            return error
         return view(*args, **kwargs)
     return wrapped
 
 
+def int_arg(name, default=None, minimum=None, maximum=None):
+    try:
+        value = int(request.args.get(name, ''))
+    except ValueError:
+        return default
+    if minimum is not None:
+        value = max(minimum, value)
+    if maximum is not None:
+        value = min(maximum, value)
+    return value
+
+
+def date_arg(name):
+    try:
+        return datetime.strptime(request.args.get(name, '').strip(), '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def like_prefix(value):
+    escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'{escaped}%'
+
+
+def json_row(row):
+    return {
+        key: value.isoformat() if isinstance(value, (date, datetime)) else value
+        for key, value in dict(row).items()
+    }
+
+
 @app.before_request
 def before_request():
-    if app.config.get('AUTO_SCHEMA_INIT'):
-        try:
-            ensure_schema()
-        except Exception:
-            app.config['AUTO_SCHEMA_INIT'] = False
+    g.request_started = time.perf_counter()
+    if not app.config.get('SCHEMA_READY'):
+        if app.config['SCHEMA_VERSION_CHECK']:
+            check_schema()
+        else:
+            schema_is_current()
+    if app.config['EXPIRY_SCHEDULER'] and 'expiry_scheduler' not in app.extensions:
+        start_expiry_scheduler()
+
+
+@app.after_request
+def record_request_metrics(response):
+    # Se registra primero para ejecutarse al final e incluir el commit y la compresión.
+    started = g.get('request_started')
+    if app.config['METRICS_ENABLED'] and started is not None:
+        REQUEST_DURATION.observe(
+            time.perf_counter() - started,
+            endpoint=request.endpoint or 'unmatched',
+            method=request.method,
+            status=response.status_code,
+        )
+    return response
+
+
+@app.after_request
+def commit_request_unit(response):
+    unit = g.get('db_unit')
+    if unit is None:
+        return response
+    if unit.in_transaction:
+        if response.status_code >= 500:
+            unit.rollback()
+        else:
+            unit.commit()
+    if unit.pending_invalidations:
+        # También tras un rollback: los bloques de chunk_transaction ya pueden estar confirmados.
+        pending, unit.pending_invalidations = unit.pending_invalidations, set()
+        publish_invalidations(pending)
+    return response
+
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/javascript',
+    'application/json',
+    'image/svg+xml',
+    'text/css',
+    'text/csv',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+}
+COMPRESS_MAX_SIZE = 2 * 1024 * 1024
+compressed_bodies = MemoryBackend(max_entries=256)
+
+
+def compress_body(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(app.config['COMPRESS_LEVEL'], 11))
+    return gzip.compress(data, compresslevel=min(app.config['COMPRESS_LEVEL'], 9), mtime=0)
+
+
+def accepted_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+@app.after_request
+def compress_response(response):
+    if not app.config['COMPRESS_RESPONSES'] or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = accepted_encoding()
+    length = response.content_length
+    if (
+        encoding is None
+        or response.status_code != 200
+        or 'Content-Encoding' in response.headers
+        or length is None
+        or not app.config['COMPRESS_MIN_SIZE'] <= length <= COMPRESS_MAX_SIZE
+    ):
+        return response
+
+    # send_file entrega el archivo directo al servidor; con tamaño acotado se puede leer en memoria.
+    response.direct_passthrough = False
+    etag, weak = response.get_etag()
+    cache_key = f'{encoding}:{etag}' if etag and not weak else None
+    body = compressed_bodies.get(cache_key) if cache_key else MISSING
+    if body is MISSING:
+        body = compress_body(response.get_data(), encoding)
+        if cache_key:
+            compressed_bodies.set(cache_key, body)
+    if len(body) >= length:
+        return response
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    if etag and not weak:
+        # La versión comprimida no es idéntica byte a byte: la ETag pasa a ser débil.
+        response.set_etag(etag, weak=True)
+    return response
+
+
+@app.after_request
+def check_query_budget(response):
+    mode = query_budget_mode()
+    if mode == 'off':
+        return response
+    query_log = g.pop('query_log', [])
+    response.headers['X-Query-Count'] = str(len(query_log))
+    view = app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None) or app.config['QUERY_BUDGET_DEFAULT']
+    problems, duplicates = query_budget_problems(query_log, budget, getattr(view, 'query_repeats_allowed', False))
+    for fingerprint, count in duplicates.items():
+        app.logger.warning('Consulta repetida %s veces en %s: %s', count, request.endpoint, fingerprint)
+    if problems:
+        message = f"{request.method} {request.path} ({request.endpoint}): {'; '.join(problems)}"
+        if mode == 'raise':
+            raise QueryBudgetExceeded(message)
+        app.logger.warning('Presupuesto de consultas excedido: %s', message)
+    return response
+
+
+@app.teardown_request
+def close_request_unit(error=None):
+    unit = g.pop('db_unit', None)
+    if unit is None:
+        return
+    if error is not None:
+        unit.rollback()
+    unit.close()
 
 @app.route('/')
+@query_budget(3)
 def index ():
-    active_plans = []
+    plans = []
     try:
-        active_plans = query_all(
-            f'SELECT id, name, sessions_per_month, price FROM gym_plans WHERE is_active = {sql_true()} ORDER BY id ASC'
-        )
+        plans = sorted(active_plans(), key=lambda plan: plan['id'])
     except Exception:
-        active_plans = []
+        plans = []
     data = {
         'titulo': 'UNBROKEN',
         'bienvenida': 'Bienvenido a UNBROKEN',
-        'planes': active_plans,
+        'planes': plans,
         'admin_logged': bool(session.get('is_authenticated')),
     }
     return render_template('index.html', data=data)
 
 
+def client_ip():
+    if app.config['TRUST_PROXY_HEADERS']:
+        forwarded = request.headers.get('X-Forwarded-For', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.remote_addr or 'desconocida'
+
+
+def get_login_limiters():
+    limiters = app.extensions.get('login_limiters')
+    if limiters is None:
+        backend_name = app.config['LOGIN_RATE_LIMIT_BACKEND']
+        limiters = {}
+        if backend_name != 'none':
+            if backend_name == 'redis':
+                store = RedisBucketStore(app.config['LOGIN_RATE_LIMIT_REDIS_URL'])
+            else:
+                store = MemoryBucketStore()
+            limiters = {
+                'ip': TokenBucket(store, app.config['LOGIN_IP_ATTEMPTS'], app.config['LOGIN_IP_PERIOD']),
+                'user': TokenBucket(store, app.config['LOGIN_USER_ATTEMPTS'], app.config['LOGIN_USER_PERIOD']),
+            }
+        app.extensions['login_limiters'] = limiters
+    return limiters
+
+
+def login_retry_after(username):
+    limiters = get_login_limiters()
+    keys = [('ip', f'ip:{client_ip()}')]
+    if username:
+        keys.append(('user', f'user:{username.lower()}'))
+
+    try:
+        for name, key in keys:
+            if name in limiters:
+                allowed, wait = limiters[name].consume(key)
+                # Si la IP ya está limitada no se gasta el cupo del usuario: otro no puede bloquear su cuenta.
+                if not allowed:
+                    return wait
+    except Exception:
+        app.logger.exception('No se pudo consultar el límite de intentos de inicio de sesión.')
+        return 0
+    return 0
+
+
+def reset_login_attempts(username):
+    limiter = get_login_limiters().get('user')
+    if limiter is None:
+        return
+    try:
+        limiter.reset(f'user:{username.lower()}')
+    except Exception:
+        app.logger.exception('No se pudo reiniciar el límite de intentos de inicio de sesión.')
+
+
 @app.route('/login', methods=['POST'])
 def login():
     username = request.form.get('username', '').strip()
     password = request.form.get('password', '').strip()
 
-    if username == ADMIN_USER and password == ADMIN_PASSWORD:
+    # Se rechaza antes de calcular el hash para que una ráfaga de intentos no consuma CPU.
+    retry_after = login_retry_after(username)
+    if retry_after:
+        minutes = max(1, math.ceil(retry_after / 60))
+        flash(f'Demasiados intentos de inicio de sesión. Intenta de nuevo en {minutes} minuto(s).', 'danger')
+        return redirect(url_for('index'))
+
+    if username == ADMIN_USER and hmac.compare_digest(password.encode(), ADMIN_PASSWORD.encode()):
+        reset_login_attempts(username)
         session['is_authenticated'] = True
         session['is_admin'] = True
         session['user_role'] = 'admin'
@@ -452,7 +1421,7 @@ def login():
 
     try:
         admin = query_one(
-            f'SELECT id, username, password_hash, role FROM gym_admins WHERE username = %s AND is_active = {sql_true()}',
+            f'SELECT id, username, password_hash, role, auth_epoch FROM gym_admins WHERE username = %s AND is_active = {sql_true()}',
             (username,),
         )
     except Exception:
@@ -461,15 +1430,22 @@ def login():
 
     is_valid = False
     user_role = 'admin'
-    if admin and check_password_hash(admin['password_hash'], password):
+    if admin and verify_password(admin['password_hash'], password):
         is_valid = True
         user_role = admin.get('role', 'admin')
+        if password_needs_rehash(admin['password_hash']):
+            try:
+                execute('UPDATE gym_admins SET password_hash = %s WHERE id = %s', (hash_password(password), admin['id']))
+            except Exception:
+                app.logger.exception('No se pudo actualizar el hash de la contraseña.')
 
     if is_valid:
+        reset_login_attempts(username)
         session['is_authenticated'] = True
         session['is_admin'] = user_role == 'admin'
         session['user_role'] = user_role
         session['admin_user'] = username
+        session['auth_epoch'] = admin['auth_epoch']
         flash('Sesión iniciada correctamente.', 'success')
     else:
         flash('Credenciales inválidas.', 'danger')
@@ -484,119 +1460,96 @@ def logout():
     return redirect(url_for('index'))
 
 
-@app.route('/dashboard')
-@login_required
-def dashboard():
-    user_role = current_role()
-    can_manage = user_role == 'admin'
-    members_count = 0
-    active_count = 0
-    plans = []
-    recent_members = []
-    recent_session_logs = []
-    monthly_members_raw = []
-    monthly_sessions_raw = []
+DASHBOARD_COUNTS_SQL = """
+    SELECT (SELECT COUNT(*) FROM gym_members) AS members,
+           (SELECT COUNT(*) FROM gym_subscriptions WHERE status = 'active') AS active
+"""
+RECENT_MEMBERS_SQL = """
+    SELECT m.id, m.full_name, m.document, s.remaining_sessions, s.status, p.name AS plan_name
+    FROM gym_members m
+    LEFT JOIN gym_subscriptions s ON s.id = m.current_subscription_id
+    LEFT JOIN gym_plans p ON p.id = s.plan_id
+    ORDER BY m.id DESC
+    LIMIT 10
+"""
+RECENT_SESSION_LOGS_SQL = """
+    SELECT id, member_document, member_name, action,
+           remaining_before, remaining_after,
+           performed_by, performed_role, created_at
+    FROM gym_session_logs
+    ORDER BY id DESC
+    LIMIT 15
+"""
+MONTHLY_ROLLUPS_SQL = """
+    SELECT period_start, metric, total
+    FROM gym_activity_rollups
+    WHERE period = 'month'
+      AND period_start >= %s
+      AND metric IN ('member_created', 'session_discount')
+"""
+MEMBER_LOOKUP_SQL = """
+    SELECT m.full_name,
+           m.document,
+           s.remaining_sessions,
+           s.status,
+           s.end_date,
+           p.name AS plan_name
+    FROM gym_members m
+    LEFT JOIN gym_subscriptions s ON s.id = m.current_subscription_id
+    LEFT JOIN gym_plans p ON p.id = s.plan_id
+    WHERE m.document = %s
+"""
+
+
+def dashboard_reads(since):
+    # nombre: (clave de caché, ttl, etiquetas, consulta, parámetros, una sola fila)
+    return {
+        'counts': ('dashboard:counts', 30, ('members', 'subscriptions'), DASHBOARD_COUNTS_SQL, (), True),
+        'plans': ('plans:active', 300, ('plans',), active_plans_sql(), (), False),
+        'recent_members': (
+            'dashboard:recent_members', None, ('members', 'subscriptions', 'plans'), RECENT_MEMBERS_SQL, (), False,
+        ),
+        'recent_logs': ('dashboard:recent_logs', None, ('activity',), RECENT_SESSION_LOGS_SQL, (), False),
+        'monthly': (
+            f'dashboard:monthly:{since.isoformat()}', 300, ('activity', 'members'), MONTHLY_ROLLUPS_SQL, (since,), False,
+        ),
+    }
+
+
+def cached_read(key, ttl, tags, sql, params, one):
+    fetch = query_one if one else query_all
+    return cached(key, lambda: fetch(sql, params), ttl=ttl, tags=tags)
+
 
+def dashboard_months():
     months = []
     month_cursor = date.today().replace(day=1)
-    for _ in range(11, -1, -1):
+    for _ in range(12):
         months.insert(0, month_cursor)
         if month_cursor.month == 1:
             month_cursor = month_cursor.replace(year=month_cursor.year - 1, month=12)
         else:
             month_cursor = month_cursor.replace(month=month_cursor.month - 1)
-    months = months[-12:]
+    return months
 
+
+def render_dashboard(data, months, lookup_document, member_lookup):
+    user_role = current_role()
     month_labels = [f"{m.month:02d}/{m.year}" for m in months]
     month_keys = [f"{m.year}-{m.month:02d}" for m in months]
     month_members = [0 for _ in month_keys]
     month_sessions = [0 for _ in month_keys]
     trailing_avg = [0 for _ in month_keys]
     drop_alert = None
+    data = data or {}
+    counts = data.get('counts') or {}
 
-    try:
-        members_count_row = query_one('SELECT COUNT(*) AS total FROM gym_members')
-        members_count = members_count_row['total'] if members_count_row else 0
-
-        active_count_row = query_one(
-            f"""
-            SELECT COUNT(*) AS total
-            FROM gym_subscriptions
-            WHERE status = 'active' AND remaining_sessions > 0 AND end_date >= {sql_today()}
-            """
-        )
-        active_count = active_count_row['total'] if active_count_row else 0
-
-        plans = query_all(f'SELECT id, name FROM gym_plans WHERE is_active = {sql_true()} ORDER BY name')
-        recent_members = query_all(
-            """
-            SELECT m.id, m.full_name, m.document, s.remaining_sessions, s.status, p.name AS plan_name
-            FROM gym_members m
-            LEFT JOIN gym_subscriptions s ON s.id = (
-                SELECT gs.id
-                FROM gym_subscriptions gs
-                WHERE gs.member_id = m.id
-                ORDER BY gs.id DESC
-                LIMIT 1
-            )
-            LEFT JOIN gym_plans p ON p.id = s.plan_id
-            ORDER BY m.id DESC
-            LIMIT 10
-            """
-        )
-        recent_session_logs = query_all(
-            """
-            SELECT id, member_document, member_name, action,
-                   remaining_before, remaining_after,
-                   performed_by, performed_role, created_at
-            FROM gym_session_logs
-            ORDER BY id DESC
-            LIMIT 15
-            """
-        )
-        if is_postgres():
-            monthly_members_raw = query_all(
-                """
-                SELECT to_char(created_at, 'YYYY-MM') AS ym, COUNT(*) AS total
-                FROM gym_members
-                WHERE created_at >= (CURRENT_DATE - INTERVAL '12 months')
-                GROUP BY to_char(created_at, 'YYYY-MM')
-                ORDER BY ym ASC
-                """
-            )
-            monthly_sessions_raw = query_all(
-                """
-                SELECT to_char(created_at, 'YYYY-MM') AS ym, COUNT(*) AS total
-                FROM gym_session_logs
-                WHERE action = 'session_discount'
-                  AND created_at >= (CURRENT_DATE - INTERVAL '12 months')
-                GROUP BY to_char(created_at, 'YYYY-MM')
-                ORDER BY ym ASC
-                """
-            )
-        else:
-            monthly_members_raw = query_all(
-                """
-                SELECT DATE_FORMAT(created_at, '%%Y-%%m') AS ym, COUNT(*) AS total
-                FROM gym_members
-                WHERE created_at >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-                GROUP BY DATE_FORMAT(created_at, '%%Y-%%m')
-                ORDER BY ym ASC
-                """
-            )
-            monthly_sessions_raw = query_all(
-                """
-                SELECT DATE_FORMAT(created_at, '%%Y-%%m') AS ym, COUNT(*) AS total
-                FROM gym_session_logs
-                WHERE action = 'session_discount'
-                  AND created_at >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-                GROUP BY DATE_FORMAT(created_at, '%%Y-%%m')
-                ORDER BY ym ASC
-                """
-            )
-
-        members_map = {row['ym']: int(row['total']) for row in monthly_members_raw}
-        sessions_map = {row['ym']: int(row['total']) for row in monthly_sessions_raw}
+    if data:
+        members_map = {}
+        sessions_map = {}
+        for row in data['monthly']:
+            target = members_map if row['metric'] == 'member_created' else sessions_map
+            target[row['period_start'].strftime('%Y-%m')] = int(row['total'])
 
         month_members = [members_map.get(key, 0) for key in month_keys]
         month_sessions = [sessions_map.get(key, 0) for key in month_keys]
@@ -618,90 +1571,360 @@ def dashboard():
                     'current': current_month_sessions,
                     'avg': previous_three_avg,
                 }
+
+    return render_template(
+        'dashboard.html',
+        members_count=counts.get('members', 0),
+        active_count=counts.get('active', 0),
+        plans=data.get('plans', []),
+        recent_members=data.get('recent_members', []),
+        recent_session_logs=data.get('recent_logs', []),
+        month_labels=month_labels,
+        month_members=month_members,
+        month_sessions=month_sessions,
+        trailing_avg=trailing_avg,
+        drop_alert=drop_alert,
+        lookup_document=lookup_document,
+        member_lookup=member_lookup,
+        user_role=user_role,
+        can_manage=user_role == 'admin',
+    )
+
+
+DASHBOARD_UNAVAILABLE = 'No hay conexión con la base de datos. El panel se muestra en modo limitado.'
+
+
+@app.route('/dashboard')
+@query_budget(8)
+@login_required
+@conditional_view('members', 'subscriptions', 'plans', 'activity')
+def dashboard():
+    months = dashboard_months()
+    lookup_document = request.args.get('document', '').strip()
+    calls = {name: partial(cached_read, *read) for name, read in dashboard_reads(months[0]).items()}
+    if lookup_document:
+        calls['member_lookup'] = partial(query_one, MEMBER_LOOKUP_SQL, (lookup_document,))
+    results = fan_out(calls)
+
+    member_lookup, _ = results.pop('member_lookup', (None, None))
+    data = None
+    if any(error is not None for _, error in results.values()):
+        flash(DASHBOARD_UNAVAILABLE, 'warning')
+    else:
+        data = {name: value for name, (value, _) in results.items()}
+
+    return render_dashboard(data, months, lookup_document, member_lookup)
+
+
+MEMBERS_PAGE_SIZE = 25
+MEMBERS_MAX_PAGE_SIZE = 100
+MEMBER_STATUS_FILTERS = ('active', 'expired', 'cancelled', 'none')
+
+
+def member_filters():
+    status = request.args.get('status', '').strip()
+    return {
+        'q': request.args.get('q', '').strip(),
+        'plan_id': int_arg('plan_id'),
+        'status': status if status in MEMBER_STATUS_FILTERS else '',
+        'limit': int_arg('limit', MEMBERS_PAGE_SIZE, 1, MEMBERS_MAX_PAGE_SIZE),
+        'after': int_arg('after'),
+    }
+
+
+def members_page_query(filters):
+    conditions = []
+    params = []
+    if filters['after']:
+        conditions.append('m.id < %s')
+        params.append(filters['after'])
+    if filters['q']:
+        if is_postgres():
+            conditions.append("(m.document LIKE %s OR lower(m.full_name) LIKE %s)")
+            params.extend([like_prefix(filters['q']), like_prefix(filters['q'].lower())])
+        else:
+            conditions.append("(m.document LIKE %s OR m.full_name LIKE %s)")
+            params.extend([like_prefix(filters['q']), like_prefix(filters['q'])])
+    if filters['plan_id']:
+        conditions.append('s.plan_id = %s')
+        params.append(filters['plan_id'])
+    if filters['status'] == 'none':
+        conditions.append('s.id IS NULL')
+    elif filters['status']:
+        conditions.append('s.status = %s')
+        params.append(filters['status'])
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    sql = f"""
+        SELECT m.id, m.full_name, m.document, m.phone, m.email,
+               m.injuries, m.conditions_text,
+               m.emergency_contact_name, m.emergency_contact_phone,
+               s.remaining_sessions, s.status, s.end_date, p.name AS plan_name
+        FROM gym_members m
+        LEFT JOIN gym_subscriptions s ON s.id = m.current_subscription_id
+        LEFT JOIN gym_plans p ON p.id = s.plan_id
+        {where}
+        ORDER BY m.id DESC
+        LIMIT %s
+    """
+    return sql, (*params, filters['limit'] + 1)
+
+
+def fetch_members_page(filters):
+    return members_page(query_all(*members_page_query(filters)), filters)
+
+
+def members_page(rows, filters):
+    next_cursor = None
+    if len(rows) > filters['limit']:
+        rows = rows[:filters['limit']]
+        next_cursor = rows[-1]['id']
+    return rows, next_cursor
+
+
+def members_page_args(filters, after):
+    args = {key: value for key, value in filters.items() if value and key not in ('after', 'limit')}
+    if filters['limit'] != MEMBERS_PAGE_SIZE:
+        args['limit'] = filters['limit']
+    if after:
+        args['after'] = after
+    return args
+
+
+MEMBER_PLANS_SQL = 'SELECT id, name FROM gym_plans ORDER BY name'
+MEMBERS_UNAVAILABLE = 'No hay conexión con la base de datos. La vista de miembros está en modo limitado.'
+
+
+@app.route('/members')
+@query_budget(5)
+@admin_required
+@conditional_view('members', 'subscriptions', 'plans')
+def members_list():
+    filters = member_filters()
+    members = []
+    next_cursor = None
+    plans = []
+    try:
+        members, next_cursor = fetch_members_page(filters)
+        plans = query_all(MEMBER_PLANS_SQL)
     except Exception:
-        flash('No hay conexión con la base de datos. El panel se muestra en modo limitado.', 'warning')
+        flash(MEMBERS_UNAVAILABLE, 'warning')
+    return render_members_list(filters, members, next_cursor, plans)
 
-    lookup_document = request.args.get('document', '').strip()
-    member_lookup = None
-    if lookup_document:
-        try:
-            member_lookup = query_one(
-                """
-                SELECT m.full_name,
-                       m.document,
-                       s.remaining_sessions,
-                       s.status,
-                       s.end_date,
-                       p.name AS plan_name
-                FROM gym_members m
-                LEFT JOIN gym_subscriptions s ON s.id = (
-                    SELECT gs.id
-                    FROM gym_subscriptions gs
-                    WHERE gs.member_id = m.id
-                    ORDER BY gs.id DESC
-                    LIMIT 1
-                )
-                LEFT JOIN gym_plans p ON p.id = s.plan_id
-                WHERE m.document = %s
-                """,
-                (lookup_document,),
-            )
-        except Exception:
-            member_lookup = None
 
+def render_members_list(filters, members, next_cursor, plans):
     return render_template(
-        'dashboard.html',
-        members_count=members_count,
-        active_count=active_count,
+        'members_list.html',
+        members=members,
         plans=plans,
-        recent_members=recent_members,
-        recent_session_logs=recent_session_logs,
-        month_labels=month_labels,
-        month_members=month_members,
-        month_sessions=month_sessions,
-        trailing_avg=trailing_avg,
-        drop_alert=drop_alert,
-        lookup_document=lookup_document,
-        member_lookup=member_lookup,
-        user_role=user_role,
-        can_manage=can_manage,
+        filters=filters,
+        next_cursor=next_cursor,
+        next_args=members_page_args(filters, next_cursor),
+        first_args=members_page_args(filters, None),
     )
 
 
-@app.route('/members')
+@app.route('/api/members')
+@query_budget(4)
 @admin_required
-def members_list():
-    members = []
+@conditional_view('members', 'subscriptions', 'plans')
+def api_members():
+    filters = member_filters()
+    members, next_cursor = fetch_members_page(filters)
+    return members_payload(members, next_cursor)
+
+
+def members_payload(members, next_cursor):
+    payload = {
+        'ok': True,
+        'items': [json_row(member) for member in members],
+        'next_cursor': next_cursor,
+    }
+    if request.args.get('include_html') == '1':
+        payload['rows_html'] = render_template('_members_rows.html', members=members)
+    return jsonify(payload)
+
+
+AUDIT_PAGE_SIZE = 50
+AUDIT_MAX_PAGE_SIZE = 200
+SESSION_LOG_ACTIONS = {
+    'session_discount': 'Descuento de sesión',
+}
+
+
+def audit_filters():
+    action = request.args.get('action', '').strip()
+    return {
+        'document': request.args.get('document', '').strip(),
+        'performed_by': request.args.get('performed_by', '').strip(),
+        'action': action if action in SESSION_LOG_ACTIONS else '',
+        'date_from': date_arg('date_from'),
+        'date_to': date_arg('date_to'),
+        'archive': request.args.get('archive') == '1',
+        'limit': int_arg('limit', AUDIT_PAGE_SIZE, 1, AUDIT_MAX_PAGE_SIZE),
+        'after': int_arg('after'),
+    }
+
+
+def fetch_audit_page(filters):
+    conditions = []
+    params = []
+    if filters['after']:
+        conditions.append('id < %s')
+        params.append(filters['after'])
+    if filters['document']:
+        conditions.append('member_document = %s')
+        params.append(filters['document'])
+    if filters['performed_by']:
+        conditions.append('performed_by = %s')
+        params.append(filters['performed_by'])
+    if filters['action']:
+        conditions.append('action = %s')
+        params.append(filters['action'])
+    if filters['date_from']:
+        conditions.append('created_at >= %s')
+        params.append(filters['date_from'])
+    if filters['date_to']:
+        conditions.append('created_at < %s')
+        params.append(filters['date_to'] + timedelta(days=1))
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    columns = ', '.join(SESSION_LOG_COLUMNS)
+    limit = filters['limit'] + 1
+    hot = f'SELECT {columns} FROM gym_session_logs {where} ORDER BY id DESC LIMIT %s'
+    if filters['archive']:
+        archived = f'SELECT {columns} FROM gym_session_logs_archive {where} ORDER BY id DESC LIMIT %s'
+        rows = query_all(
+            f'SELECT * FROM (({hot}) UNION ALL ({archived})) logs ORDER BY id DESC LIMIT %s',
+            (*params, limit, *params, limit, limit),
+        )
+    else:
+        rows = query_all(hot, (*params, limit))
+
+    next_cursor = None
+    if len(rows) > filters['limit']:
+        rows = rows[:filters['limit']]
+        next_cursor = rows[-1]['id']
+    return rows, next_cursor
+
+
+def audit_page_args(filters, after):
+    args = {}
+    for key, value in filters.items():
+        if not value or key in ('after', 'limit'):
+            continue
+        if key == 'archive':
+            value = 1
+        elif isinstance(value, date):
+            value = value.isoformat()
+        args[key] = value
+    if filters['limit'] != AUDIT_PAGE_SIZE:
+        args['limit'] = filters['limit']
+    if after:
+        args['after'] = after
+    return args
+
+
+@app.route('/audit')
+@query_budget(4)
+@admin_required
+def audit_log():
+    filters = audit_filters()
+    logs = []
+    next_cursor = None
     try:
-        members = query_all(
+        logs, next_cursor = fetch_audit_page(filters)
+    except Exception:
+        flash('No hay conexión con la base de datos. No es posible consultar la auditoría.', 'warning')
+    return render_template(
+        'audit_log.html',
+        logs=logs,
+        filters=filters,
+        actions=SESSION_LOG_ACTIONS,
+        next_cursor=next_cursor,
+        next_args=audit_page_args(filters, next_cursor),
+        first_args=audit_page_args(filters, None),
+    )
+
+
+@app.route('/api/audit')
+@query_budget(4)
+@admin_required
+def api_audit():
+    filters = audit_filters()
+    logs, next_cursor = fetch_audit_page(filters)
+    payload = {
+        'ok': True,
+        'items': [json_row(log) for log in logs],
+        'next_cursor': next_cursor,
+    }
+    if request.args.get('include_html') == '1':
+        payload['rows_html'] = render_template('_audit_rows.html', logs=logs, actions=SESSION_LOG_ACTIONS)
+    return jsonify(payload)
+
+
+def lock_active_plan(plan_id):
+    # La lista de planes en caché puede estar vieja en esta instancia: el plan se confirma en la misma transacción.
+    lock = 'FOR SHARE' if is_postgres() else 'LOCK IN SHARE MODE'
+    with transaction():
+        return query_one(
+            f'SELECT id, name, sessions_per_month, price FROM gym_plans WHERE id = %s AND is_active = {sql_true()} {lock}',
+            (int(plan_id),),
+        )
+
+
+def start_subscription(member_id, plan):
+    start_date = date.today()
+    end_date = start_date + timedelta(days=30)
+    params = (member_id, plan['id'], start_date, end_date, plan['sessions_per_month'])
+
+    if is_postgres():
+        subscription_id = execute_returning(
             """
-            SELECT m.id, m.full_name, m.document, m.phone, m.email,
-                   m.injuries, m.conditions_text,
-                   m.emergency_contact_name, m.emergency_contact_phone,
-                   s.remaining_sessions, s.status, s.end_date, p.name AS plan_name
-            FROM gym_members m
-            LEFT JOIN gym_subscriptions s ON s.id = (
-                SELECT gs.id
-                FROM gym_subscriptions gs
-                WHERE gs.member_id = m.id
-                ORDER BY gs.id DESC
-                LIMIT 1
+            WITH cancelled AS (
+                UPDATE gym_subscriptions
+                SET status = 'cancelled'
+                WHERE member_id = %s AND status = 'active'
+            ),
+            created AS (
+                INSERT INTO gym_subscriptions (member_id, plan_id, start_date, end_date, remaining_sessions, status)
+                VALUES (%s, %s, %s, %s, %s, 'active')
+                RETURNING id, member_id
             )
-            LEFT JOIN gym_plans p ON p.id = s.plan_id
-            ORDER BY m.id DESC
-            """
-        )
-    except Exception:
-        flash('No hay conexión con la base de datos. La vista de miembros está en modo limitado.', 'warning')
-    return render_template('members_list.html', members=members)
+            UPDATE gym_members m
+            SET current_subscription_id = created.id
+            FROM created
+            WHERE m.id = created.member_id
+            RETURNING created.id
+            """,
+            (member_id, *params),
+        )['id']
+        invalidate_cache('subscriptions')
+        return subscription_id
+
+    execute(
+        "UPDATE gym_subscriptions SET status = 'cancelled' WHERE member_id = %s AND status = 'active'",
+        (member_id,),
+    )
+    subscription_id, _ = execute(
+        """
+        INSERT INTO gym_subscriptions (member_id, plan_id, start_date, end_date, remaining_sessions, status)
+        VALUES (%s, %s, %s, %s, %s, 'active')
+        """,
+        params,
+    )
+    execute('UPDATE gym_members SET current_subscription_id = %s WHERE id = %s', (subscription_id, member_id))
+    invalidate_cache('subscriptions')
+    return subscription_id
 
 
 @app.route('/members/new', methods=['GET', 'POST'])
+@query_budget(8)
 @admin_required
 def members_new():
     plans = []
     try:
-        plans = query_all(f'SELECT id, name, sessions_per_month FROM gym_plans WHERE is_active = {sql_true()} ORDER BY name')
+        plans = active_plans()
     except Exception:
         flash('No hay conexión con la base de datos. No es posible cargar planes en este momento.', 'warning')
 
@@ -724,7 +1947,7 @@ def members_new():
             flash('Nombre, documento y plan son obligatorios.', 'danger')
             return render_template('members_form.html', plans=plans)
 
-        plan = query_one(f'SELECT id, sessions_per_month FROM gym_plans WHERE id = %s AND is_active = {sql_true()}', (plan_id,))
+        plan = lock_active_plan(plan_id) if plan_id.isdigit() else None
         if not plan:
             flash('Plan inválido.', 'danger')
             return render_template('members_form.html', plans=plans)
@@ -755,25 +1978,221 @@ def members_new():
                 """,
                 (full_name, document, phone, email, injuries, conditions_text, emergency_name, emergency_phone),
             )
+            bump_rollup('member_created')
 
-        execute(
-            "UPDATE gym_subscriptions SET status = 'cancelled' WHERE member_id = %s AND status = 'active'",
-            (member_id,),
-        )
+        start_subscription(member_id, plan)
+        invalidate_cache('members', 'activity')
+        flash('Miembro registrado y plan asignado correctamente.', 'success')
+        return redirect(url_for('members_list'))
 
-        start_date = date.today()
-        end_date = start_date + timedelta(days=30)
-        execute(
-            """
+    return render_template('members_form.html', plans=plans)
+
+
+MEMBER_IMPORT_CHUNK_SIZE = 200
+MEMBER_IMPORT_MAX_ERRORS = 200
+MEMBER_EXPORT_BATCH_SIZE = 500
+
+
+class ImportRowError(Exception):
+    pass
+
+
+INTEGRITY_ERRORS = (pymysql.err.IntegrityError,) + ((psycopg.IntegrityError,) if psycopg else ())
+DATA_ERRORS = (pymysql.err.DataError,) + ((psycopg.DataError,) if psycopg else ())
+
+
+def import_error_message(error):
+    # El texto del motor (tablas, restricciones, SQL) queda solo en el log del servidor.
+    if isinstance(error, ImportRowError):
+        return str(error)
+    if isinstance(error, INTEGRITY_ERRORS):
+        return 'El documento ya existe o entra en conflicto con otro registro.'
+    if isinstance(error, DATA_ERRORS):
+        return 'Algún valor es demasiado largo o tiene un formato inválido.'
+    return 'No se pudo guardar la fila. Revisa los datos e inténtalo de nuevo.'
+
+
+def import_member_chunk(records):
+    documents = [record['document'] for record in records]
+    in_documents = ', '.join(['%s'] * len(documents))
+    start_date = date.today()
+    end_date = start_date + timedelta(days=30)
+    updatable = [field for field in MEMBER_FIELDS if field != 'document']
+    if is_postgres():
+        on_conflict = 'ON CONFLICT (document) DO UPDATE SET ' + ', '.join(
+            f'{field} = EXCLUDED.{field}' for field in updatable
+        )
+    else:
+        on_conflict = 'ON DUPLICATE KEY UPDATE ' + ', '.join(f'{field} = VALUES({field})' for field in updatable)
+
+    plan_ids = sorted({record['plan']['id'] for record in records})
+    lock = 'FOR SHARE' if is_postgres() else 'LOCK IN SHARE MODE'
+
+    with chunk_transaction() as conn:
+        cursor = dict_cursor(conn)
+        # Los planes se validaron contra la caché; se confirman aquí por si otra instancia los desactivó.
+        timed_execute(
+            cursor,
+            f"SELECT id FROM gym_plans WHERE id IN ({', '.join(['%s'] * len(plan_ids))}) AND is_active = {sql_true()} {lock}",
+            plan_ids,
+        )
+        inactive = set(plan_ids) - {row['id'] for row in cursor.fetchall()}
+        if inactive:
+            name = next(record['plan']['name'] for record in records if record['plan']['id'] in inactive)
+            raise ImportRowError(f'Plan inválido o inactivo: {name}.')
+
+        timed_execute(cursor, f'SELECT document FROM gym_members WHERE document IN ({in_documents})', documents)
+        existing = {row['document'] for row in cursor.fetchall()}
+
+        member_values = ', '.join([f"({', '.join(['%s'] * len(MEMBER_FIELDS))})"] * len(records))
+        timed_execute(
+            cursor,
+            f"INSERT INTO gym_members ({', '.join(MEMBER_FIELDS)}) VALUES {member_values} {on_conflict}",
+            [record[field] for record in records for field in MEMBER_FIELDS],
+        )
+        timed_execute(cursor, f'SELECT id, document FROM gym_members WHERE document IN ({in_documents})', documents)
+        member_ids = {row['document']: row['id'] for row in cursor.fetchall()}
+        ids = [member_ids[document] for document in documents]
+        in_ids = ', '.join(['%s'] * len(ids))
+
+        timed_execute(
+            cursor,
+            f"UPDATE gym_subscriptions SET status = 'cancelled' WHERE status = 'active' AND member_id IN ({in_ids})",
+            ids,
+        )
+        subscription_values = ', '.join(["(%s, %s, %s, %s, %s, 'active')"] * len(records))
+        timed_execute(
+            cursor,
+            f"""
             INSERT INTO gym_subscriptions (member_id, plan_id, start_date, end_date, remaining_sessions, status)
-            VALUES (%s, %s, %s, %s, %s, 'active')
+            VALUES {subscription_values}
             """,
-            (member_id, plan['id'], start_date, end_date, plan['sessions_per_month']),
+            [
+                value
+                for record in records
+                for value in (
+                    member_ids[record['document']],
+                    record['plan']['id'],
+                    start_date,
+                    end_date,
+                    record['plan']['sessions_per_month'],
+                )
+            ],
         )
-        flash('Miembro registrado y plan asignado correctamente.', 'success')
-        return redirect(url_for('members_list'))
+        timed_execute(
+            cursor,
+            f"""
+            UPDATE gym_members
+            SET current_subscription_id = (
+                SELECT MAX(s.id)
+                FROM gym_subscriptions s
+                WHERE s.member_id = gym_members.id AND s.status = 'active'
+            )
+            WHERE id IN ({in_ids})
+            """,
+            ids,
+        )
+        cursor.close()
 
-    return render_template('members_form.html', plans=plans)
+        created = len(set(documents) - existing)
+        if created:
+            bump_rollup('member_created', created)
+    return created
+
+
+def import_members(rows, plans):
+    plans_by_key = plans_lookup(plans)
+    report = {'processed': 0, 'created': 0, 'updated': 0, 'error_count': 0, 'errors': []}
+
+    def add_error(line_number, message):
+        report['error_count'] += 1
+        if len(report['errors']) < MEMBER_IMPORT_MAX_ERRORS:
+            report['errors'].append({'line': line_number, 'message': message})
+
+    def flush(chunk):
+        if not chunk:
+            return
+        try:
+            created = import_member_chunk([record for _, record in chunk])
+            report['created'] += created
+            report['updated'] += len(chunk) - created
+        except Exception as error:
+            if len(chunk) == 1:
+                if not isinstance(error, ImportRowError):
+                    app.logger.warning('Fila %s no importada: %s', chunk[0][0], error)
+                add_error(chunk[0][0], import_error_message(error))
+                return
+            # Se reintenta fila por fila para aislar la que hace fallar el bloque.
+            for item in chunk:
+                flush([item])
+
+    chunk = []
+    seen = set()
+    for line_number, raw in rows:
+        report['processed'] += 1
+        record, error = validate_member_row(raw, plans_by_key)
+        if error:
+            add_error(line_number, error)
+            continue
+        if record['document'] in seen or len(chunk) >= MEMBER_IMPORT_CHUNK_SIZE:
+            flush(chunk)
+            chunk = []
+            seen = set()
+        chunk.append((line_number, record))
+        seen.add(record['document'])
+    flush(chunk)
+
+    if report['created'] or report['updated']:
+        invalidate_cache('members', 'subscriptions', 'activity')
+    return report
+
+
+@app.route('/members/import', methods=['GET', 'POST'])
+@admin_required
+@query_budget(allow_repeats=True)
+def members_import():
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Selecciona un archivo CSV o XLSX.', 'danger')
+            return redirect(url_for('members_import'))
+        try:
+            report = import_members(read_member_rows(upload.stream, upload.filename), active_plans())
+        except (ImportFormatError, UnicodeDecodeError) as error:
+            message = str(error) if isinstance(error, ImportFormatError) else 'El archivo debe estar en UTF-8.'
+            flash(message, 'danger')
+            return redirect(url_for('members_import'))
+        category = 'warning' if report['error_count'] else 'success'
+        flash(
+            f"Importación terminada: {report['created']} nuevos, {report['updated']} actualizados, "
+            f"{report['error_count']} con errores.",
+            category,
+        )
+    return render_template('members_import.html', report=report)
+
+
+@app.route('/members/export.csv')
+@admin_required
+def members_export():
+    filters = {**member_filters(), 'limit': MEMBER_EXPORT_BATCH_SIZE, 'after': None}
+
+    def batches():
+        while True:
+            rows, next_cursor = fetch_members_page(filters)
+            for row in rows:
+                row['plan'] = row['plan_name']
+            yield rows
+            if not next_cursor:
+                return
+            filters['after'] = next_cursor
+
+    filename = f'miembros-{date.today().isoformat()}.csv'
+    return Response(
+        stream_with_context(csv_chunks(batches())),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
 
 
 @app.route('/members/<int:member_id>/delete', methods=['POST'])
@@ -786,110 +2205,587 @@ def members_delete(member_id):
 
     execute('DELETE FROM gym_subscriptions WHERE member_id = %s', (member_id,))
     execute('DELETE FROM gym_members WHERE id = %s', (member_id,))
+    invalidate_cache('members', 'subscriptions')
     flash(f"Miembro {member['full_name']} eliminado correctamente.", 'success')
     return redirect(url_for('members_list'))
 
 
-@app.route('/subscriptions/use-session', methods=['POST'])
-@login_required
-def use_session():
-    document = request.form.get('document', '').strip()
-    if not document:
-        flash('Debes enviar el documento.', 'danger')
-        return redirect(url_for('dashboard'))
+def bump_rollup(metric, amount=1):
+    if is_postgres():
+        execute(
+            """
+            INSERT INTO gym_activity_rollups (period, period_start, metric, total)
+            VALUES ('day', CURRENT_DATE, %s, %s),
+                   ('month', CAST(date_trunc('month', CURRENT_DATE) AS DATE), %s, %s)
+            ON CONFLICT (period, period_start, metric)
+            DO UPDATE SET total = gym_activity_rollups.total + EXCLUDED.total
+            """,
+            (metric, amount, metric, amount),
+            returning_id=False,
+        )
+    else:
+        execute(
+            """
+            INSERT INTO gym_activity_rollups (period, period_start, metric, total)
+            VALUES ('day', CURDATE(), %s, %s),
+                   ('month', CAST(DATE_FORMAT(CURDATE(), '%%Y-%%m-01') AS DATE), %s, %s)
+            ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+            """,
+            (metric, amount, metric, amount),
+        )
 
-    member = query_one('SELECT id, full_name, document FROM gym_members WHERE document = %s', (document,))
-    if not member:
-        flash('No existe un miembro con ese documento.', 'danger')
-        return redirect(url_for('dashboard'))
 
-    subscription = query_one(
+def expire_subscriptions(batch_size=None, max_batches=None):
+    batch_size = batch_size or app.config['EXPIRY_BATCH_SIZE']
+    if is_postgres():
+        sql = """
+            UPDATE gym_subscriptions
+            SET status = 'expired'
+            WHERE id IN (
+                SELECT id
+                FROM gym_subscriptions
+                WHERE status = 'active' AND end_date < CURRENT_DATE
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            """
+    else:
+        sql = """
+            UPDATE gym_subscriptions
+            SET status = 'expired'
+            WHERE status = 'active' AND end_date < CURDATE()
+            ORDER BY id
+            LIMIT %s
+            """
+
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with chunk_transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, (batch_size,))
+            expired = cursor.rowcount or 0
+            cursor.close()
+        total += expired
+        batches += 1
+        if expired < batch_size:
+            break
+
+    if total:
+        invalidate_cache('subscriptions')
+    return total
+
+
+_expiry_scheduler_lock = threading.Lock()
+
+
+def run_expiry_scheduler(interval):
+    while True:
+        try:
+            with app.app_context():
+                expired = expire_subscriptions()
+            if expired:
+                app.logger.info('Suscripciones vencidas por fecha: %s.', expired)
+        except Exception:
+            app.logger.exception('No se pudo ejecutar el vencimiento de suscripciones.')
+        time.sleep(interval)
+
+
+def start_expiry_scheduler():
+    with _expiry_scheduler_lock:
+        if 'expiry_scheduler' in app.extensions:
+            return
+        worker = threading.Thread(
+            target=run_expiry_scheduler,
+            args=(app.config['EXPIRY_INTERVAL_SECONDS'],),
+            name='expiry-scheduler',
+            daemon=True,
+        )
+        worker.start()
+        app.extensions['expiry_scheduler'] = worker
+
+
+@app.route('/api/tasks/expire-subscriptions', methods=['GET', 'POST'])
+@query_budget(allow_repeats=True)
+def api_expire_subscriptions():
+    secret = app.config['CRON_SECRET']
+    if not secret or request.headers.get('Authorization', '') != f'Bearer {secret}':
+        return jsonify({'ok': False, 'error': 'No autorizado.'}), 401
+    return jsonify({'ok': True, 'expired': expire_subscriptions()})
+
+
+SESSION_LOG_COLUMNS = (
+    'id',
+    'member_id',
+    'member_document',
+    'member_name',
+    'subscription_id',
+    'action',
+    'remaining_before',
+    'remaining_after',
+    'performed_by',
+    'performed_role',
+    'notes',
+    'client_ref',
+    'created_at',
+)
+
+
+def months_ago(months, today=None):
+    month_start = (today or date.today()).replace(day=1)
+    total = month_start.year * 12 + month_start.month - 1 - months
+    return month_start.replace(year=total // 12, month=total % 12 + 1)
+
+
+def archive_session_logs(before, batch_size=None):
+    batch_size = batch_size or app.config['SESSION_LOG_BATCH_SIZE']
+    columns = ', '.join(SESSION_LOG_COLUMNS)
+    moved = 0
+    while True:
+        with chunk_transaction() as conn:
+            cursor = dict_cursor(conn)
+            if is_postgres():
+                cursor.execute(
+                    f"""
+                    WITH moved AS (
+                        DELETE FROM gym_session_logs
+                        WHERE id IN (
+                            SELECT id
+                            FROM gym_session_logs
+                            WHERE created_at < %s
+                            ORDER BY id
+                            LIMIT %s
+                            FOR UPDATE SKIP LOCKED
+                        )
+                        RETURNING {columns}
+                    )
+                    INSERT INTO gym_session_logs_archive ({columns})
+                    SELECT {columns} FROM moved
+                    """,
+                    (before, batch_size),
+                )
+                count = cursor.rowcount or 0
+            else:
+                cursor.execute(
+                    'SELECT id FROM gym_session_logs WHERE created_at < %s ORDER BY id LIMIT %s FOR UPDATE',
+                    (before, batch_size),
+                )
+                ids = [row['id'] for row in cursor.fetchall()]
+                count = len(ids)
+                if ids:
+                    in_ids = ', '.join(['%s'] * count)
+                    cursor.execute(
+                        f"""
+                        INSERT INTO gym_session_logs_archive ({columns})
+                        SELECT {columns} FROM gym_session_logs WHERE id IN ({in_ids})
+                        """,
+                        ids,
+                    )
+                    cursor.execute(f'DELETE FROM gym_session_logs WHERE id IN ({in_ids})', ids)
+            cursor.close()
+        moved += count
+        if count < batch_size:
+            return moved
+
+
+def purge_archived_session_logs(before, batch_size=None):
+    batch_size = batch_size or app.config['SESSION_LOG_BATCH_SIZE']
+    if is_postgres():
+        sql = """
+            DELETE FROM gym_session_logs_archive
+            WHERE id IN (
+                SELECT id FROM gym_session_logs_archive WHERE created_at < %s ORDER BY id LIMIT %s
+            )
+            """
+    else:
+        sql = 'DELETE FROM gym_session_logs_archive WHERE created_at < %s ORDER BY id LIMIT %s'
+
+    purged = 0
+    while True:
+        with chunk_transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, (before, batch_size))
+            count = cursor.rowcount or 0
+            cursor.close()
+        purged += count
+        if count < batch_size:
+            return purged
+
+
+def export_archived_month(month_start, path, batch_size=None):
+    batch_size = batch_size or app.config['SESSION_LOG_BATCH_SIZE']
+    month_end = months_ago(-1, month_start)
+    exported = 0
+    last_id = 0
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as output:
+        writer = csv.writer(output)
+        writer.writerow(SESSION_LOG_COLUMNS)
+        while True:
+            rows = query_all(
                 f"""
-        SELECT id, remaining_sessions
-        FROM gym_subscriptions
-        WHERE member_id = %s
-          AND status = 'active'
-                    AND end_date >= {sql_today()}
-        ORDER BY id DESC
-        LIMIT 1
+                SELECT {', '.join(SESSION_LOG_COLUMNS)}
+                FROM gym_session_logs_archive
+                WHERE created_at >= %s AND created_at < %s AND id > %s
+                ORDER BY id
+                LIMIT %s
+                """,
+                (month_start, month_end, last_id, batch_size),
+            )
+            for row in rows:
+                writer.writerow([row[column] for column in SESSION_LOG_COLUMNS])
+            exported += len(rows)
+            if len(rows) < batch_size:
+                return exported
+            last_id = rows[-1]['id']
+
+
+CHECK_IN_MESSAGES = {
+    'member_not_found': ('No existe un miembro con ese documento.', 'danger'),
+    'no_active_subscription': ('El miembro no tiene suscripción activa.', 'danger'),
+    'no_sessions': ('El miembro ya no tiene sesiones disponibles.', 'warning'),
+}
+CHECK_IN_NOTES = 'Descuento de sesión por ingreso'
+CHECK_IN_SYNC_BATCH = 100
+
+
+def _check_in_postgres(conn, document, entry):
+    cursor = dict_cursor(conn)
+    timed_execute(
+        cursor,
+        """
+        WITH target AS (
+            SELECT s.id, m.id AS member_id, m.document, m.full_name
+            FROM gym_members m
+            JOIN gym_subscriptions s ON s.id = m.current_subscription_id
+            WHERE m.document = %s
+              AND s.status = 'active'
+              AND s.end_date >= CURRENT_DATE
+              AND NOT EXISTS (SELECT 1 FROM gym_session_logs l WHERE l.client_ref = %s)
+        ),
+        updated AS (
+            UPDATE gym_subscriptions s
+            SET remaining_sessions = s.remaining_sessions - 1,
+                status = CASE WHEN s.remaining_sessions > 1 THEN 'active' ELSE 'expired' END
+            FROM target t
+            WHERE s.id = t.id
+              AND s.status = 'active'
+              AND s.remaining_sessions > 0
+            RETURNING s.id, s.remaining_sessions, t.member_id, t.document, t.full_name
+        ),
+        rolled_up AS (
+            INSERT INTO gym_activity_rollups (period, period_start, metric, total)
+            SELECT bucket.period, bucket.period_start, 'session_discount', 1
+            FROM updated
+            CROSS JOIN (
+                VALUES ('day', CURRENT_DATE), ('month', CAST(date_trunc('month', CURRENT_DATE) AS DATE))
+            ) AS bucket (period, period_start)
+            ON CONFLICT (period, period_start, metric)
+            DO UPDATE SET total = gym_activity_rollups.total + EXCLUDED.total
+        )
+        INSERT INTO gym_session_logs
+        (member_id, member_document, member_name, subscription_id, action,
+         remaining_before, remaining_after, performed_by, performed_role, notes, client_ref)
+        SELECT member_id, document, full_name, id, 'session_discount',
+               remaining_sessions + 1, remaining_sessions, %s, %s, %s, %s
+        FROM updated
+        RETURNING member_name, subscription_id, remaining_after
         """,
-        (member['id'],),
+        (
+            document,
+            entry['client_ref'],
+            entry['performed_by'],
+            entry['performed_role'],
+            entry['notes'],
+            entry['client_ref'],
+        ),
     )
-    if not subscription:
-        flash('El miembro no tiene suscripción activa.', 'danger')
-        return redirect(url_for('dashboard'))
+    row = cursor.fetchone()
+    cursor.close()
+    if not row:
+        return None
+    return {'member_name': row['member_name'], 'subscription_id': row['subscription_id'], 'remaining': row['remaining_after']}
 
-    if subscription['remaining_sessions'] <= 0:
-        flash('El miembro ya no tiene sesiones disponibles.', 'warning')
-        return redirect(url_for('dashboard'))
 
-    new_remaining = subscription['remaining_sessions'] - 1
-    new_status = 'active' if new_remaining > 0 else 'expired'
-    execute(
-        'UPDATE gym_subscriptions SET remaining_sessions = %s, status = %s WHERE id = %s',
-        (new_remaining, new_status, subscription['id']),
+def _check_in_mysql(conn, document, entry):
+    cursor = dict_cursor(conn)
+    timed_execute(
+        cursor,
+        """
+        SELECT s.id, s.remaining_sessions, m.id AS member_id, m.document, m.full_name
+        FROM gym_members m
+        JOIN gym_subscriptions s ON s.id = m.current_subscription_id
+        WHERE m.document = %s
+          AND s.status = 'active'
+          AND s.end_date >= CURDATE()
+        FOR UPDATE
+        """,
+        (document,),
     )
-    execute(
+    target = cursor.fetchone()
+    if not target or target['remaining_sessions'] <= 0:
+        cursor.close()
+        return None
+
+    if entry['client_ref']:
+        timed_execute(
+            cursor,
+            'SELECT id FROM gym_session_logs WHERE client_ref = %s LOCK IN SHARE MODE',
+            (entry['client_ref'],),
+        )
+        if cursor.fetchone():
+            cursor.close()
+            return None
+
+    timed_execute(
+        cursor,
+        """
+        UPDATE gym_subscriptions
+        SET status = CASE WHEN remaining_sessions > 1 THEN 'active' ELSE 'expired' END,
+            remaining_sessions = remaining_sessions - 1
+        WHERE id = %s AND remaining_sessions > 0
+        """,
+        (target['id'],),
+    )
+    remaining = target['remaining_sessions'] - 1
+    timed_execute(
+        cursor,
         """
         INSERT INTO gym_session_logs
         (member_id, member_document, member_name, subscription_id, action,
-         remaining_before, remaining_after, performed_by, performed_role, notes)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+         remaining_before, remaining_after, performed_by, performed_role, notes, client_ref)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """,
         (
-            member['id'],
-            member['document'],
-            member['full_name'],
-            subscription['id'],
+            target['member_id'],
+            target['document'],
+            target['full_name'],
+            target['id'],
             'session_discount',
-            subscription['remaining_sessions'],
-            new_remaining,
-            session.get('admin_user', 'desconocido'),
-            current_role() or 'admin',
-            'Descuento de sesión por ingreso',
+            target['remaining_sessions'],
+            remaining,
+            entry['performed_by'],
+            entry['performed_role'],
+            entry['notes'],
+            entry['client_ref'],
         ),
     )
-    flash(f'Sesión registrada. Sesiones restantes: {new_remaining}.', 'success')
+    cursor.close()
+    bump_rollup('session_discount')
+    return {'member_name': target['full_name'], 'subscription_id': target['id'], 'remaining': remaining}
+
+
+def check_in_failure_reason(document, client_ref=None):
+    if client_ref and query_one('SELECT id FROM gym_session_logs WHERE client_ref = %s', (client_ref,)):
+        return 'duplicate'
+
+    row = query_one(
+        f"""
+        SELECT m.id, s.remaining_sessions
+        FROM gym_members m
+        LEFT JOIN gym_subscriptions s
+            ON s.id = m.current_subscription_id
+           AND s.status = 'active'
+           AND s.end_date >= {sql_today()}
+        WHERE m.document = %s
+        """,
+        (document,),
+    )
+    if not row:
+        return 'member_not_found'
+    if row['remaining_sessions'] is None:
+        return 'no_active_subscription'
+    return 'no_sessions'
+
+
+def is_unique_violation(error):
+    if psycopg is not None and isinstance(error, psycopg.errors.UniqueViolation):
+        return True
+    return isinstance(error, pymysql.err.IntegrityError) and error.args and error.args[0] == 1062
+
+
+def check_in_member(document, performed_by, performed_role, client_ref=None, notes=CHECK_IN_NOTES):
+    entry = {
+        'performed_by': performed_by,
+        'performed_role': performed_role,
+        'notes': notes,
+        'client_ref': client_ref or None,
+    }
+    try:
+        if is_postgres():
+            # Una sola sentencia: en autocommit no abre transacción explícita.
+            result = run_with_connection(lambda conn: _check_in_postgres(conn, document, entry))
+        else:
+            with transaction() as conn:
+                result = _check_in_mysql(conn, document, entry)
+    except Exception as error:
+        if client_ref and is_unique_violation(error):
+            # En MySQL el descuento ya se aplicó en la transacción de la petición: se deshace antes de responder.
+            unit = current_unit()
+            if unit is not None:
+                unit.rollback()
+            return {'ok': True, 'code': 'duplicate'}
+        raise
+
+    if result is None:
+        code = check_in_failure_reason(document, entry['client_ref'])
+        return {'ok': code == 'duplicate', 'code': code}
+    invalidate_cache('subscriptions', 'activity')
+    return {'ok': True, 'code': 'ok', **result}
+
+
+@app.route('/subscriptions/use-session', methods=['POST'])
+@query_budget(3)
+@login_required
+def use_session():
+    document = request.form.get('document', '').strip()
+    if not document:
+        flash('Debes enviar el documento.', 'danger')
+        return redirect(url_for('dashboard'))
+
+    result = check_in_member(document, session.get('admin_user', 'desconocido'), current_role() or 'admin')
+    if not result['ok']:
+        message, category = CHECK_IN_MESSAGES[result['code']]
+        flash(message, category)
+        return redirect(url_for('dashboard'))
+
+    flash(f"Sesión registrada. Sesiones restantes: {result['remaining']}.", 'success')
     return redirect(url_for('dashboard'))
 
 
+@app.route('/api/checkin', methods=['POST'])
+@query_budget(3)
+@login_required
+def api_checkin():
+    payload = request.get_json(silent=True) or request.form
+    document = str(payload.get('document', '')).strip()
+    if not document:
+        return jsonify({'ok': False, 'code': 'missing_document', 'message': 'Debes enviar el documento.'}), 400
+
+    client_ref = str(payload.get('client_ref', '')).strip()[:64] or None
+    result = check_in_member(
+        document,
+        session.get('admin_user', 'desconocido'),
+        current_role() or 'admin',
+        client_ref=client_ref,
+    )
+    if result['code'] == 'duplicate':
+        return jsonify({'ok': True, 'code': 'duplicate', 'document': document, 'message': 'Este ingreso ya estaba registrado.'})
+    if not result['ok']:
+        message, _ = CHECK_IN_MESSAGES[result['code']]
+        status_code = 404 if result['code'] == 'member_not_found' else 409
+        return jsonify({'ok': False, 'code': result['code'], 'message': message, 'document': document}), status_code
+
+    return jsonify({
+        'ok': True,
+        'code': 'ok',
+        'document': document,
+        'member_name': result['member_name'],
+        'remaining': result['remaining'],
+        'status': 'active' if result['remaining'] > 0 else 'expired',
+        'message': f"Sesión registrada. Sesiones restantes: {result['remaining']}.",
+    })
+
+
+def check_in_snapshot_sql():
+    return f"""
+        SELECT m.document, m.full_name, s.remaining_sessions, s.end_date
+        FROM gym_subscriptions s
+        JOIN gym_members m ON m.current_subscription_id = s.id
+        WHERE s.status = 'active'
+          AND s.remaining_sessions > 0
+          AND s.end_date >= {sql_today()}
+    """
+
+
+def load_check_in_snapshot():
+    return [json_row(row) for row in query_all(check_in_snapshot_sql())]
+
+
+def check_in_snapshot_payload(members):
+    return jsonify({'ok': True, 'generated_at': datetime.now().isoformat(timespec='seconds'), 'members': members})
+
+
+@app.route('/api/checkin/snapshot')
+@query_budget(2)
+@login_required
+def api_checkin_snapshot():
+    members = cached('checkin:snapshot', load_check_in_snapshot, ttl=60, tags=('members', 'subscriptions'))
+    return check_in_snapshot_payload(members)
+
+
+@app.route('/api/checkin/sync', methods=['POST'])
+@login_required
+@query_budget(allow_repeats=True)
+def api_checkin_sync():
+    payload = request.get_json(silent=True) or {}
+    scans = payload.get('scans')
+    if not isinstance(scans, list) or not scans or len(scans) > CHECK_IN_SYNC_BATCH:
+        return jsonify({'ok': False, 'error': f'Envía entre 1 y {CHECK_IN_SYNC_BATCH} ingresos por lote.'}), 400
+
+    performed_by = session.get('admin_user', 'desconocido')
+    performed_role = current_role() or 'admin'
+    results = []
+    for scan in scans:
+        scan = scan if isinstance(scan, dict) else {}
+        client_ref = str(scan.get('client_ref', '')).strip()[:64]
+        document = str(scan.get('document', '')).strip()
+        if not client_ref or not document:
+            results.append({'client_ref': client_ref, 'status': 'rejected', 'code': 'invalid'})
+            continue
+
+        scanned_at = str(scan.get('scanned_at', '')).strip()[:32]
+        result = check_in_member(
+            document,
+            performed_by,
+            performed_role,
+            client_ref=client_ref,
+            notes=f'Ingreso sin conexión ({scanned_at})' if scanned_at else 'Ingreso sin conexión',
+        )
+        # Cada ingreso se confirma por separado para que un rechazo no deshaga los demás.
+        request_unit().commit()
+
+        item = {'client_ref': client_ref, 'document': document, 'code': result['code']}
+        if result['code'] == 'ok':
+            item.update(status='applied', member_name=result['member_name'], remaining=result['remaining'])
+        elif result['code'] == 'duplicate':
+            item['status'] = 'duplicate'
+        else:
+            item.update(status='rejected', message=CHECK_IN_MESSAGES[result['code']][0])
+        results.append(item)
+
+    return jsonify({'ok': True, 'results': results})
+
+
 @app.route('/subscriptions/renew', methods=['POST'])
+@query_budget(6)
 @admin_required
 def renew_subscription():
     document = request.form.get('document', '').strip()
     plan_id = request.form.get('plan_id', '').strip()
 
-    member = query_one('SELECT id FROM gym_members WHERE document = %s', (document,))
+    member = query_one(
+        """
+        SELECT m.id, s.plan_id
+        FROM gym_members m
+        LEFT JOIN gym_subscriptions s ON s.id = m.current_subscription_id
+        WHERE m.document = %s
+        """,
+        (document,),
+    )
     if not member:
         flash('No existe un miembro con ese documento.', 'danger')
         return redirect(url_for('dashboard'))
 
     if not plan_id:
-        latest = query_one(
-            'SELECT plan_id FROM gym_subscriptions WHERE member_id = %s ORDER BY id DESC LIMIT 1',
-            (member['id'],),
-        )
-        plan_id = latest['plan_id'] if latest else None
+        plan_id = member['plan_id']
 
     plan = query_one(f'SELECT id, sessions_per_month FROM gym_plans WHERE id = %s AND is_active = {sql_true()}', (plan_id,))
     if not plan:
         flash('Plan inválido para renovación.', 'danger')
         return redirect(url_for('dashboard'))
 
-    execute(
-        "UPDATE gym_subscriptions SET status = 'cancelled' WHERE member_id = %s AND status = 'active'",
-        (member['id'],),
-    )
-
-    start_date = date.today()
-    end_date = start_date + timedelta(days=30)
-    execute(
-        """
-        INSERT INTO gym_subscriptions (member_id, plan_id, start_date, end_date, remaining_sessions, status)
-        VALUES (%s, %s, %s, %s, %s, 'active')
-        """,
-        (member['id'], plan['id'], start_date, end_date, plan['sessions_per_month']),
-    )
+    start_subscription(member['id'], plan)
     flash('Suscripción renovada correctamente.', 'success')
     return redirect(url_for('members_list'))
 
@@ -910,12 +2806,52 @@ def cancel_subscription():
     if affected == 0:
         flash('No había licencia activa para cancelar.', 'warning')
     else:
+        invalidate_cache('subscriptions')
         flash('Licencia cancelada correctamente.', 'success')
     return redirect(url_for('members_list'))
 
 
+@app.route('/api/cache-stats')
+@admin_required
+def api_cache_stats():
+    return jsonify({'ok': True, 'cache': get_cache().snapshot()})
+
+
+def metrics_snapshot():
+    snapshot = []
+    pool = app.extensions.get('db_pool')
+    if pool is not None:
+        snapshot += [
+            ('unbroken_db_pool_size', 'gauge', 'Conexiones abiertas por el pool.', pool.size),
+            ('unbroken_db_pool_idle', 'gauge', 'Conexiones libres en el pool.', pool.idle_count),
+        ]
+        snapshot += [
+            (f'unbroken_db_pool_{name}_total', 'counter', f'Conexiones del pool: {name}.', value)
+            for name, value in pool.stats.items()
+        ]
+    cache_stats = get_cache().snapshot()
+    for name in ('hits', 'misses', 'sets', 'invalidations', 'errors', 'evictions'):
+        snapshot.append((f'unbroken_cache_{name}_total', 'counter', f'Caché de la aplicación: {name}.', cache_stats[name]))
+    return snapshot
+
+
+@app.route('/metrics')
+def metrics_view():
+    token = app.config['METRICS_TOKEN']
+    authorized = session.get('is_admin') or (
+        token and hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode())
+    )
+    if not authorized:
+        return 'No autorizado.', 401
+    if not app.config['METRICS_ENABLED']:
+        return 'Métricas desactivadas.', 404
+    return app.response_class(metrics.render(metrics_snapshot()), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/settings/plans')
+@query_budget(4)
 @admin_required
+@conditional_view('plans', 'admins')
 def settings_plans():
     plans = []
     staff_users = []
@@ -949,6 +2885,7 @@ def settings_plans_create():
         'INSERT INTO gym_plans (name, sessions_per_month, price, is_active) VALUES (%s, %s, %s, %s)',
         (name, int(sessions_per_month), float(price), active_value()),
     )
+    invalidate_cache('plans')
     flash('Plan creado correctamente.', 'success')
     return redirect(url_for('settings_plans'))
 
@@ -968,6 +2905,7 @@ def settings_plans_edit(plan_id):
         'UPDATE gym_plans SET name = %s, sessions_per_month = %s, price = %s WHERE id = %s',
         (name, int(sessions_per_month), float(price), plan_id),
     )
+    invalidate_cache('plans')
     flash('Plan actualizado correctamente.', 'success')
     return redirect(url_for('settings_plans'))
 
@@ -982,6 +2920,7 @@ def settings_plans_toggle(plan_id):
 
     new_state = (not bool(plan['is_active'])) if is_postgres() else (0 if plan['is_active'] else 1)
     execute('UPDATE gym_plans SET is_active = %s WHERE id = %s', (new_state, plan_id))
+    invalidate_cache('plans')
     flash('Estado del plan actualizado.', 'success')
     return redirect(url_for('settings_plans'))
 
@@ -995,6 +2934,7 @@ def settings_plans_delete(plan_id):
         return redirect(url_for('settings_plans'))
 
     execute('DELETE FROM gym_plans WHERE id = %s', (plan_id,))
+    invalidate_cache('plans')
     flash('Plan eliminado.', 'success')
     return redirect(url_for('settings_plans'))
 
@@ -1029,9 +2969,13 @@ def settings_admin_password():
         return redirect(url_for('settings_plans'))
 
     execute(
-        'UPDATE gym_admins SET password_hash = %s WHERE id = %s',
-        (generate_password_hash(new_password), admin['id']),
+        'UPDATE gym_admins SET password_hash = %s, auth_epoch = auth_epoch + 1 WHERE id = %s',
+        (hash_password(new_password), admin['id']),
     )
+    invalidate_cache('admins')
+    # Las demás sesiones de esta cuenta quedan invalidadas; la actual sigue activa.
+    updated = query_one('SELECT auth_epoch FROM gym_admins WHERE id = %s', (admin['id'],))
+    session['auth_epoch'] = updated['auth_epoch']
     flash('Contraseña actualizada correctamente.', 'success')
     return redirect(url_for('settings_plans'))
 
@@ -1057,8 +3001,9 @@ def settings_staff_create():
 
     execute(
         'INSERT INTO gym_admins (username, password_hash, role, is_active) VALUES (%s, %s, %s, %s)',
-        (username, generate_password_hash(password), 'staff', active_value()),
+        (username, hash_password(password), 'staff', active_value()),
     )
+    invalidate_cache('admins')
     flash('Encargado creado correctamente.', 'success')
     return redirect(url_for('settings_plans'))
 
@@ -1073,6 +3018,7 @@ def settings_staff_toggle(user_id):
 
     new_state = (not bool(user['is_active'])) if is_postgres() else (0 if user['is_active'] else 1)
     execute('UPDATE gym_admins SET is_active = %s WHERE id = %s', (new_state, user_id))
+    bump_auth_epoch(user_id)
     flash('Estado del encargado actualizado.', 'success')
     return redirect(url_for('settings_plans'))
 
@@ -1086,6 +3032,7 @@ def settings_staff_delete(user_id):
         return redirect(url_for('settings_plans'))
 
     execute('DELETE FROM gym_admins WHERE id = %s', (user_id,))
+    invalidate_cache('admins')
     flash(f"Encargado {user['username']} eliminado.", 'success')
     return redirect(url_for('settings_plans'))
 
@@ -1108,6 +3055,74 @@ def member_qr(document):
     return render_template('member_qr.html', member=member)
 
 
+QR_RENDER_VERSION = 1
+QR_MIMETYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+QR_CARDS_MAX = 200
+# Caché propia y pequeña: las hojas de QR no deben expulsar los datos de la caché compartida.
+qr_images = MemoryBackend(max_entries=256)
+
+
+def member_qr_image(document, fmt, scale=8):
+    key = f'{fmt}:{scale}:{document}'
+    image = qr_images.get(key)
+    if image is MISSING:
+        modules = qr_matrix(document)
+        image = render_png(modules, scale=scale) if fmt == 'png' else render_svg(modules, scale=scale)
+        qr_images.set(key, image, app.config['QR_CACHE_SECONDS'])
+    return image
+
+
+@app.route('/miembro-qr/<document>/qr.<any(png, svg):fmt>')
+def member_qr_image_view(document, fmt):
+    scale = int_arg('scale', 8, 2, 20)
+    # El QR solo depende del documento: la ETag se calcula sin consultar la base ni dibujar.
+    etag = hashlib.sha1(f'{QR_RENDER_VERSION}:{fmt}:{scale}:{document}'.encode()).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        member = query_one('SELECT document FROM gym_members WHERE document = %s', (document,))
+        if not member:
+            return 'QR no encontrado.', 404
+        response = app.response_class(member_qr_image(document, fmt, scale), mimetype=QR_MIMETYPES[fmt])
+        if request.args.get('download') == '1':
+            safe_document = ''.join(char if char.isalnum() or char in '-_' else '_' for char in document)
+            response.headers['Content-Disposition'] = f'attachment; filename=qr_{safe_document}.{fmt}'
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['QR_CACHE_SECONDS']
+    return response
+
+
+@app.route('/members/qr-cards')
+@admin_required
+def members_qr_cards():
+    filters = {**member_filters(), 'limit': int_arg('limit', 60, 1, QR_CARDS_MAX)}
+    members = []
+    next_cursor = None
+    try:
+        members, next_cursor = fetch_members_page(filters)
+    except Exception:
+        flash('No hay conexión con la base de datos. No es posible generar las tarjetas.', 'warning')
+    cards = [
+        {'member': member, 'svg': Markup(member_qr_image(member['document'], 'svg').decode('utf-8'))}
+        for member in members
+    ]
+    next_args = members_page_args(filters, next_cursor)
+    next_args['limit'] = filters['limit']
+    return render_template('member_qr_cards.html', cards=cards, next_cursor=next_cursor, next_args=next_args)
+
+
+@app.route('/assets/<path:filename>')
+def fingerprinted_asset(filename):
+    source = asset_manifest.resolve(filename)
+    if not source:
+        return 'Archivo no encontrado.', 404
+    response = send_from_directory(app.static_folder, source, max_age=app.config['ASSET_MAX_AGE'])
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
 @app.route('/db-test')
 def db_test():
     try:
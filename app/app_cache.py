@@ -0,0 +1,179 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except Exception:
+    redis = None
+
+MISSING = object()
+
+
+class MemoryBackend:
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key):
+        # Los contadores de generación no caducan ni cuentan para el LRU.
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def get_counters(self, keys):
+        with self._lock:
+            return [self._counters.get(key, 0) for key in keys]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    def __init__(self, url, prefix='unbroken:'):
+        if redis is None:
+            raise RuntimeError('Falta instalar redis para usar CACHE_BACKEND=redis.')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.evictions = 0
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return MISSING if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def get_counters(self, keys):
+        raws = self.client.mget([self.prefix + key for key in keys])
+        return [0 if raw is None else int(raw) for raw in raws]
+
+    def clear(self):
+        for key in self.client.scan_iter(f'{self.prefix}*'):
+            self.client.delete(key)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(f'{self.prefix}*'))
+
+
+class AppCache:
+    def __init__(self, backend, default_ttl=60, enabled=True):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self.stats = {'hits': 0, 'misses': 0, 'sets': 0, 'invalidations': 0, 'errors': 0}
+
+    def _tagged_key(self, key, tags):
+        if not tags:
+            return key
+        generations = self.backend.get_counters([f'tag:{tag}' for tag in tags])
+        stamp = '.'.join(str(generation) for generation in generations)
+        return f'{key}@{stamp}'
+
+    def get_or_set(self, key, loader, ttl=None, tags=()):
+        if not self.enabled:
+            return loader()
+
+        try:
+            full_key = self._tagged_key(key, tags)
+            value = self.backend.get(full_key)
+        except Exception:
+            self.stats['errors'] += 1
+            return loader()
+
+        if value is not MISSING:
+            self.stats['hits'] += 1
+            return value
+
+        self.stats['misses'] += 1
+        value = loader()
+        try:
+            self.backend.set(full_key, value, ttl or self.default_ttl)
+            self.stats['sets'] += 1
+        except Exception:
+            self.stats['errors'] += 1
+        return value
+
+    async def get_or_set_async(self, key, loader, ttl=None, tags=()):
+        if not self.enabled:
+            return await loader()
+
+        try:
+            full_key = self._tagged_key(key, tags)
+            value = self.backend.get(full_key)
+        except Exception:
+            self.stats['errors'] += 1
+            return await loader()
+
+        if value is not MISSING:
+            self.stats['hits'] += 1
+            return value
+
+        self.stats['misses'] += 1
+        value = await loader()
+        try:
+            self.backend.set(full_key, value, ttl or self.default_ttl)
+            self.stats['sets'] += 1
+        except Exception:
+            self.stats['errors'] += 1
+        return value
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            try:
+                self.backend.incr(f'tag:{tag}')
+                self.stats['invalidations'] += 1
+            except Exception:
+                self.stats['errors'] += 1
+
+    def clear(self):
+        self.backend.clear()
+
+    def snapshot(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'evictions': getattr(self.backend, 'evictions', 0),
+            'entries': len(self.backend),
+            'hit_ratio': round(self.stats['hits'] / lookups, 4) if lookups else 0,
+            'backend': type(self.backend).__name__,
+        }
@@ -0,0 +1,433 @@
+import asyncio
+import contextvars
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from flask import flash, request
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from app import (
+    CONNECTION_ACQUIRE_DURATION,
+    DASHBOARD_UNAVAILABLE,
+    MEMBER_LOOKUP_SQL,
+    MEMBER_PLANS_SQL,
+    MEMBERS_UNAVAILABLE,
+    app,
+    auth_error,
+    check_in_snapshot_payload,
+    check_in_snapshot_sql,
+    dashboard_months,
+    dashboard_reads,
+    data_versions_sql,
+    dict_row,
+    get_cache,
+    is_postgres,
+    json_row,
+    member_filters,
+    members_page,
+    members_page_query,
+    members_payload,
+    not_modified,
+    observe_query,
+    psycopg,
+    render_dashboard,
+    render_members_list,
+    response_validator,
+    validated_response,
+    wants_validator,
+)
+from db_pool import AsyncConnectionPool
+
+
+def async_reads_enabled():
+    return app.config['ASYNC_READS'] and is_postgres() and psycopg is not None
+
+
+async def connect_async():
+    connect_kwargs = {'row_factory': dict_row, 'connect_timeout': 10, 'autocommit': True}
+    if app.config['DB_POOL_MODE'] == 'serverless':
+        connect_kwargs['prepare_threshold'] = None
+    return await psycopg.AsyncConnection.connect(app.config['DATABASE_URL'], **connect_kwargs)
+
+
+async def ping_async(conn):
+    if conn.closed or conn.broken:
+        raise RuntimeError('Conexión PostgreSQL cerrada.')
+    await conn.execute('SELECT 1')
+
+
+async def reset_async(conn):
+    if conn.closed or conn.broken:
+        raise RuntimeError('Conexión PostgreSQL cerrada.')
+    if conn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+        await conn.rollback()
+
+
+def get_async_pool():
+    pool = app.extensions.get('async_db_pool')
+    if pool is None or pool.pid != os.getpid():
+        mode = app.config['DB_POOL_MODE']
+        pool = AsyncConnectionPool(
+            connect_async,
+            max_size=app.config['ASYNC_DB_POOL_MAX_SIZE'],
+            max_idle=0 if mode == 'off' else app.config['DB_POOL_MAX_IDLE'],
+            max_lifetime=app.config['DB_POOL_MAX_LIFETIME'],
+            timeout=app.config['DB_POOL_TIMEOUT'],
+            check_after=app.config['DB_POOL_CHECK_AFTER'],
+            ping=ping_async,
+            reset=reset_async,
+        )
+        app.extensions['async_db_pool'] = pool
+    return pool
+
+
+async def fetch(sql, params=(), one=False):
+    pool = get_async_pool()
+    started = time.perf_counter()
+    conn = await pool.acquire()
+    if app.config['METRICS_ENABLED']:
+        CONNECTION_ACQUIRE_DURATION.observe(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    try:
+        cursor = await conn.execute(sql, params)
+        result = await (cursor.fetchone() if one else cursor.fetchall())
+    except Exception:
+        await pool.release(conn, discard=True)
+        raise
+    await pool.release(conn)
+    observe_query(sql, started, (1 if result else 0) if one else len(result))
+    return result
+
+
+async def cached_async(key, loader, ttl=None, tags=()):
+    return await get_cache().get_or_set_async(key, loader, ttl=ttl, tags=tags)
+
+
+def get_executor():
+    executor = app.extensions.get('asgi_executor')
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=app.config['ASGI_THREADS'], thread_name_prefix='asgi-wsgi')
+        app.extensions['asgi_executor'] = executor
+    return executor
+
+
+async def run_sync(function, *args):
+    # Código de Flask que puede consultar la base (esquema, sesión, caché): va al pool de hilos
+    # con una copia propia del contexto, que incluye la petición activa.
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), contextvars.copy_context().run, function, *args)
+
+
+async def async_auth_error(admin=False):
+    return await run_sync(auth_error, admin)
+
+
+async def conditional(render):
+    validator = None
+    if await run_sync(wants_validator):
+        tags = app.view_functions[request.endpoint].validator_tags
+        try:
+            validator = response_validator(tags, await fetch(data_versions_sql(tags), list(tags)))
+        except Exception:
+            validator = None
+    if validator is None:
+        return await render()
+
+    response = not_modified(validator)
+    if response is None:
+        response = validated_response(await render(), validator)
+    return response
+
+
+async def load_dashboard_data_async(since):
+    reads = dashboard_reads(since)
+
+    async def load(key, ttl, tags, sql, params, one):
+        return await cached_async(key, lambda: fetch(sql, params, one), ttl=ttl, tags=tags)
+
+    # Cada lectura usa su propia conexión del pool y se esperan todas juntas.
+    values = await asyncio.gather(*(load(*read) for read in reads.values()))
+    return dict(zip(reads, values))
+
+
+async def lookup_member_async(document):
+    if not document:
+        return None
+    try:
+        return await fetch(MEMBER_LOOKUP_SQL, (document,), one=True)
+    except Exception:
+        return None
+
+
+async def render_dashboard_async():
+    months = dashboard_months()
+    lookup_document = request.args.get('document', '').strip()
+    data, member_lookup = await asyncio.gather(
+        load_dashboard_data_async(months[0]), lookup_member_async(lookup_document), return_exceptions=True
+    )
+    if isinstance(data, Exception):
+        data = None
+        flash(DASHBOARD_UNAVAILABLE, 'warning')
+    return render_dashboard(data, months, lookup_document, member_lookup)
+
+
+async def dashboard_view():
+    error = await async_auth_error()
+    if error is not None:
+        return error
+    return await conditional(render_dashboard_async)
+
+
+async def render_members_list_async():
+    filters = member_filters()
+    members = []
+    next_cursor = None
+    plans = []
+    try:
+        rows, plans = await asyncio.gather(fetch(*members_page_query(filters)), fetch(MEMBER_PLANS_SQL))
+        members, next_cursor = members_page(rows, filters)
+    except Exception:
+        flash(MEMBERS_UNAVAILABLE, 'warning')
+    return render_members_list(filters, members, next_cursor, plans)
+
+
+async def members_list_view():
+    error = await async_auth_error(admin=True)
+    if error is not None:
+        return error
+    return await conditional(render_members_list_async)
+
+
+async def render_api_members_async():
+    filters = member_filters()
+    members, next_cursor = members_page(await fetch(*members_page_query(filters)), filters)
+    return members_payload(members, next_cursor)
+
+
+async def api_members_view():
+    error = await async_auth_error(admin=True)
+    if error is not None:
+        return error
+    return await conditional(render_api_members_async)
+
+
+async def load_check_in_snapshot_async():
+    return [json_row(row) for row in await fetch(check_in_snapshot_sql())]
+
+
+async def api_checkin_snapshot_view():
+    error = await async_auth_error()
+    if error is not None:
+        return error
+    members = await cached_async(
+        'checkin:snapshot', load_check_in_snapshot_async, ttl=60, tags=('members', 'subscriptions')
+    )
+    return check_in_snapshot_payload(members)
+
+
+# Lecturas frecuentes del panel, la lista de miembros y el lector de QR. El resto pasa por la app WSGI.
+ASYNC_VIEWS = {
+    'dashboard': dashboard_view,
+    'members_list': members_list_view,
+    'api_members': api_members_view,
+    'api_checkin_snapshot': api_checkin_snapshot_view,
+}
+
+
+def build_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = name
+        else:
+            key = f'HTTP_{name}'
+            if key in environ:
+                # HTTP/2 manda cada cookie en su propia cabecera; se unen como en HTTP/1.1.
+                separator = '; ' if key == 'HTTP_COOKIE' else ','
+                value = f'{environ[key]}{separator}{value}'
+        environ[key] = value
+    return environ
+
+
+def encode_headers(headers):
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+
+def async_view(environ):
+    if not async_reads_enabled() or environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+        return None
+    try:
+        endpoint, _ = app.url_map.bind_to_environ(environ, server_name=app.config['SERVER_NAME']).match()
+    except (HTTPException, RequestRedirect):
+        return None
+    return ASYNC_VIEWS.get(endpoint)
+
+
+async def dispatch_async(environ, view):
+    # Mismo recorrido que Flask (before_request, after_request, teardown) con la vista esperada en el loop.
+    # La petición tiene su propio Context: los hooks (commit, compresión, cierre de la conexión) corren en
+    # el pool de hilos y la vista en el loop, siempre sobre ese Context, así push y pop usan los mismos tokens.
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+
+    def in_context(function, *args):
+        return loop.run_in_executor(get_executor(), context.run, function, *args)
+
+    ctx = app.request_context(environ)
+    error = None
+    await in_context(ctx.push)
+    try:
+        try:
+            try:
+                rv = await in_context(app.preprocess_request)
+                if rv is None:
+                    rv = await asyncio.create_task(view(), context=context)
+            except Exception as exc:
+                rv = await in_context(app.handle_user_exception, exc)
+            response = await in_context(app.finalize_request, rv)
+        except Exception as exc:
+            error = exc
+            response = await in_context(app.handle_exception, exc)
+        app_iter, status, headers = response.get_wsgi_response(environ)
+        return int(status.split(' ', 1)[0]), headers, b''.join(app_iter)
+    finally:
+        await in_context(ctx.pop, error)
+
+
+async def call_wsgi(environ, send):
+    loop = asyncio.get_running_loop()
+    started = {}
+
+    def deliver(message):
+        # Se espera a que el servidor acepte cada bloque: una exportación larga no se acumula en memoria.
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    def write(data):
+        raise RuntimeError('La escritura directa de WSGI no está soportada.')
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = encode_headers(headers)
+        return write
+
+    def start():
+        if not started.get('sent'):
+            deliver({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+            started['sent'] = True
+
+    def run():
+        # La petición completa (incluido el cierre de stream_with_context) corre en un hilo y en un contexto.
+        iterable = app(environ, start_response)
+        try:
+            for chunk in iterable:
+                if chunk:
+                    start()
+                    deliver({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            start()
+            deliver({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    await loop.run_in_executor(get_executor(), contextvars.copy_context().run, run)
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+async def read_body(scope, receive):
+    limit = app.config['MAX_CONTENT_LENGTH']
+    declared = dict(scope.get('headers', [])).get(b'content-length', b'')
+    # Si la cabecera ya anuncia un cuerpo mayor no se lee nada.
+    if limit and declared.isdigit() and int(declared) > limit:
+        raise BodyTooLarge()
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if limit and size > limit:
+            raise BodyTooLarge()
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+async def send_too_large(send):
+    body = 'El cuerpo de la solicitud supera el tamaño permitido.'.encode('utf-8')
+    headers = [(b'content-type', b'text/plain; charset=utf-8'), (b'content-length', str(len(body)).encode())]
+    await send({'type': 'http.response.start', 'status': 413, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            pool = app.extensions.pop('async_db_pool', None)
+            if pool is not None:
+                await pool.close()
+            executor = app.extensions.pop('asgi_executor', None)
+            if executor is not None:
+                executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def asgi_app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        raise RuntimeError(f"Tipo de conexión no soportado: {scope['type']}")
+
+    try:
+        environ = build_environ(scope, await read_body(scope, receive))
+    except BodyTooLarge:
+        await send_too_large(send)
+        return
+    view = async_view(environ)
+    if view is None:
+        await call_wsgi(environ, send)
+        return
+
+    status, headers, body = await dispatch_async(environ, view)
+    await send({'type': 'http.response.start', 'status': status, 'headers': encode_headers(headers)})
+    await send({'type': 'http.response.body', 'body': body})
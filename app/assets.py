@@ -0,0 +1,131 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import urllib.request
+
+# Librerías de terceros fijadas a una versión: se sirven desde static/vendor si están descargadas.
+VENDOR_ASSETS = {
+    'chart.js': ('vendor/chart.umd.min.js', 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js'),
+    'html5-qrcode': ('vendor/html5-qrcode.min.js', 'https://unpkg.com/html5-qrcode@2.3.8/html5-qrcode.min.js'),
+}
+# Hash SRI de cada archivo descargado; se sube junto con los archivos y fija el contenido esperado.
+VENDOR_LOCK_FILE = 'vendor/vendor.lock.json'
+FINGERPRINT_LENGTH = 12
+_FINGERPRINTED = re.compile(r'^(?P<stem>.+)\.(?P<digest>[0-9a-f]{%d})(?P<ext>\.[A-Za-z0-9]+)$' % FINGERPRINT_LENGTH)
+
+
+class VendorIntegrityError(ValueError):
+    pass
+
+
+def subresource_integrity(content):
+    return 'sha384-' + base64.b64encode(hashlib.sha384(content).digest()).decode('ascii')
+
+
+def read_vendor_lock(static_folder):
+    path = os.path.join(static_folder, VENDOR_LOCK_FILE)
+    if not os.path.isfile(path):
+        return {}
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+class AssetManifest:
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self._digests = {}
+        self._vendor_lock = None
+        self._lock = threading.Lock()
+
+    def _path(self, filename):
+        path = os.path.normpath(os.path.join(self.static_folder, filename))
+        if not path.startswith(os.path.normpath(self.static_folder) + os.sep):
+            return None
+        return path
+
+    def digest(self, filename):
+        path = self._path(filename)
+        if not path or not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._digests.get(filename)
+            if cached and cached[0] == signature:
+                return cached[1]
+        with open(path, 'rb') as handle:
+            digest = hashlib.sha256(handle.read()).hexdigest()[:FINGERPRINT_LENGTH]
+        with self._lock:
+            self._digests[filename] = (signature, digest)
+        return digest
+
+    def fingerprint(self, filename):
+        digest = self.digest(filename)
+        if not digest:
+            return None
+        stem, ext = os.path.splitext(filename)
+        return f'{stem}.{digest}{ext}'
+
+    def resolve(self, fingerprinted):
+        # Solo se sirve el archivo si el hash coincide; una versión vieja no debe quedar cacheada como inmutable.
+        match = _FINGERPRINTED.match(fingerprinted)
+        if not match:
+            return None
+        filename = match.group('stem') + match.group('ext')
+        if self.digest(filename) != match.group('digest'):
+            return None
+        return filename
+
+    def vendor_file(self, name):
+        filename, _ = VENDOR_ASSETS[name]
+        return filename if self.digest(filename) else None
+
+    def vendor_integrity(self, name):
+        path = os.path.join(self.static_folder, VENDOR_LOCK_FILE)
+        signature = os.stat(path).st_mtime_ns if os.path.isfile(path) else None
+        cached = self._vendor_lock
+        if cached is None or cached[0] != signature:
+            cached = self._vendor_lock = (signature, read_vendor_lock(self.static_folder))
+        entry = cached[1].get(name) or {}
+        return entry.get('integrity') if entry.get('url') == VENDOR_ASSETS[name][1] else None
+
+    def missing_vendor_files(self):
+        # Archivos que faltan o que no coinciden con el hash registrado al descargarlos.
+        missing = []
+        for name, (filename, _) in VENDOR_ASSETS.items():
+            path = self._path(filename)
+            integrity = self.vendor_integrity(name)
+            if not path or not os.path.isfile(path) or not integrity:
+                missing.append(name)
+                continue
+            with open(path, 'rb') as handle:
+                if subresource_integrity(handle.read()) != integrity:
+                    missing.append(name)
+        return missing
+
+
+def download_vendor_assets(static_folder, timeout=30):
+    lock = read_vendor_lock(static_folder)
+    downloaded = []
+    for name, (filename, url) in VENDOR_ASSETS.items():
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            content = response.read()
+        integrity = subresource_integrity(content)
+        locked = lock.get(name) or {}
+        # Una versión fijada no debe cambiar: si el CDN devuelve otro contenido se aborta.
+        if locked.get('url') == url and locked.get('integrity') != integrity:
+            raise VendorIntegrityError(f'{name}: el contenido de {url} no coincide con {VENDOR_LOCK_FILE}.')
+        path = os.path.join(static_folder, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as handle:
+            handle.write(content)
+        lock[name] = {'file': filename, 'url': url, 'integrity': integrity}
+        downloaded.append((name, filename, len(content), integrity))
+
+    with open(os.path.join(static_folder, VENDOR_LOCK_FILE), 'w', encoding='utf-8') as handle:
+        json.dump(lock, handle, indent=2, sort_keys=True)
+        handle.write('\n')
+    return downloaded
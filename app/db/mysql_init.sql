@@ -17,7 +17,9 @@ CREATE TABLE IF NOT EXISTS gym_members (
     conditions_text TEXT,
     emergency_contact_name VARCHAR(180),
     emergency_contact_phone VARCHAR(50),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    current_subscription_id INT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_members_full_name (full_name)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 CREATE TABLE IF NOT EXISTS gym_subscriptions (
@@ -30,6 +32,9 @@ CREATE TABLE IF NOT EXISTS gym_subscriptions (
     status VARCHAR(20) NOT NULL DEFAULT 'active',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_subscriptions_member_status (member_id, status),
+    INDEX idx_subscriptions_status_end_date (status, end_date),
+    INDEX idx_subscriptions_plan (plan_id),
     CONSTRAINT fk_sub_member FOREIGN KEY (member_id) REFERENCES gym_members(id),
     CONSTRAINT fk_sub_plan FOREIGN KEY (plan_id) REFERENCES gym_plans(id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -39,9 +44,11 @@ CREATE TABLE IF NOT EXISTS gym_admins (
     username VARCHAR(120) NOT NULL UNIQUE,
     password_hash VARCHAR(255) NOT NULL,
     role VARCHAR(20) NOT NULL DEFAULT 'admin',
+    auth_epoch INT NOT NULL DEFAULT 0,
     is_active TINYINT(1) NOT NULL DEFAULT 1,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_admins_role (role)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 CREATE TABLE IF NOT EXISTS gym_session_logs (
@@ -56,9 +63,60 @@ CREATE TABLE IF NOT EXISTS gym_session_logs (
     performed_by VARCHAR(120) NOT NULL,
     performed_role VARCHAR(20) NOT NULL,
     notes VARCHAR(255),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    client_ref VARCHAR(64) NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_session_logs_action_created (action, created_at),
+    UNIQUE INDEX uq_session_logs_client_ref (client_ref),
+    INDEX idx_session_logs_created (created_at),
+    INDEX idx_session_logs_document (member_document, id),
+    INDEX idx_session_logs_performed_by (performed_by, id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS gym_activity_rollups (
+    period VARCHAR(5) NOT NULL,
+    period_start DATE NOT NULL,
+    metric VARCHAR(40) NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (period, period_start, metric)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS gym_session_logs_archive (
+    id INT PRIMARY KEY,
+    member_id INT NULL,
+    member_document VARCHAR(50),
+    member_name VARCHAR(180),
+    subscription_id INT NULL,
+    action VARCHAR(40) NOT NULL,
+    remaining_before INT NULL,
+    remaining_after INT NULL,
+    performed_by VARCHAR(120) NOT NULL,
+    performed_role VARCHAR(20) NOT NULL,
+    notes VARCHAR(255),
+    client_ref VARCHAR(64) NULL,
+    created_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_session_logs_archive_created (created_at),
+    INDEX idx_session_logs_archive_document (member_document, id),
+    INDEX idx_session_logs_archive_performed_by (performed_by, id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+CREATE TABLE IF NOT EXISTS gym_data_versions (
+    name VARCHAR(40) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO gym_data_versions (name, version)
+SELECT 'plans', 0 WHERE NOT EXISTS (SELECT 1 FROM gym_data_versions WHERE name = 'plans');
+INSERT INTO gym_data_versions (name, version)
+SELECT 'members', 0 WHERE NOT EXISTS (SELECT 1 FROM gym_data_versions WHERE name = 'members');
+INSERT INTO gym_data_versions (name, version)
+SELECT 'subscriptions', 0 WHERE NOT EXISTS (SELECT 1 FROM gym_data_versions WHERE name = 'subscriptions');
+INSERT INTO gym_data_versions (name, version)
+SELECT 'activity', 0 WHERE NOT EXISTS (SELECT 1 FROM gym_data_versions WHERE name = 'activity');
+INSERT INTO gym_data_versions (name, version)
+SELECT 'admins', 0 WHERE NOT EXISTS (SELECT 1 FROM gym_data_versions WHERE name = 'admins');
+
 INSERT INTO gym_plans (name, sessions_per_month, price, is_active)
 SELECT 'Plan Básico', 8, 80.00, 1
 WHERE NOT EXISTS (SELECT 1 FROM gym_plans WHERE name = 'Plan Básico');
@@ -17,6 +17,7 @@ CREATE TABLE IF NOT EXISTS gym_members (
     conditions_text TEXT,
     emergency_contact_name VARCHAR(180),
     emergency_contact_phone VARCHAR(50),
+    current_subscription_id INT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -39,6 +40,7 @@ CREATE TABLE IF NOT EXISTS gym_admins (
     username VARCHAR(120) NOT NULL UNIQUE,
     password_hash VARCHAR(255) NOT NULL,
     role VARCHAR(20) NOT NULL DEFAULT 'admin',
+    auth_epoch INT NOT NULL DEFAULT 0,
     is_active BOOLEAN NOT NULL DEFAULT TRUE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -56,9 +58,22 @@ CREATE TABLE IF NOT EXISTS gym_session_logs (
     performed_by VARCHAR(120) NOT NULL,
     performed_role VARCHAR(20) NOT NULL,
     notes VARCHAR(255),
+    client_ref VARCHAR(64) NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE INDEX IF NOT EXISTS idx_subscriptions_member_status ON gym_subscriptions (member_id, status);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_status_end_date ON gym_subscriptions (status, end_date);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_plan ON gym_subscriptions (plan_id);
+CREATE INDEX IF NOT EXISTS idx_session_logs_action_created ON gym_session_logs (action, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_session_logs_client_ref ON gym_session_logs (client_ref);
+CREATE INDEX IF NOT EXISTS idx_session_logs_created ON gym_session_logs (created_at);
+CREATE INDEX IF NOT EXISTS idx_session_logs_document ON gym_session_logs (member_document, id);
+CREATE INDEX IF NOT EXISTS idx_session_logs_performed_by ON gym_session_logs (performed_by, id);
+CREATE INDEX IF NOT EXISTS idx_admins_role ON gym_admins (role);
+CREATE INDEX IF NOT EXISTS idx_members_document_prefix ON gym_members (document varchar_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_members_name_prefix ON gym_members (lower(full_name) text_pattern_ops);
+
 CREATE OR REPLACE FUNCTION set_updated_at()
 RETURNS TRIGGER AS $$
 BEGIN
@@ -79,6 +94,52 @@ BEFORE UPDATE ON gym_admins
 FOR EACH ROW
 EXECUTE FUNCTION set_updated_at();
 
+CREATE TABLE IF NOT EXISTS gym_activity_rollups (
+    period VARCHAR(5) NOT NULL,
+    period_start DATE NOT NULL,
+    metric VARCHAR(40) NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (period, period_start, metric)
+);
+
+CREATE TABLE IF NOT EXISTS gym_session_logs_archive (
+    id INT PRIMARY KEY,
+    member_id INT NULL,
+    member_document VARCHAR(50),
+    member_name VARCHAR(180),
+    subscription_id INT NULL,
+    action VARCHAR(40) NOT NULL,
+    remaining_before INT NULL,
+    remaining_after INT NULL,
+    performed_by VARCHAR(120) NOT NULL,
+    performed_role VARCHAR(20) NOT NULL,
+    notes VARCHAR(255),
+    client_ref VARCHAR(64) NULL,
+    created_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_session_logs_archive_created ON gym_session_logs_archive (created_at);
+CREATE INDEX IF NOT EXISTS idx_session_logs_archive_document ON gym_session_logs_archive (member_document, id);
+CREATE INDEX IF NOT EXISTS idx_session_logs_archive_performed_by ON gym_session_logs_archive (performed_by, id);
+
+CREATE TABLE IF NOT EXISTS gym_data_versions (
+    name VARCHAR(40) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO gym_data_versions (name, version)
+SELECT 'plans', 0 WHERE NOT EXISTS (SELECT 1 FROM gym_data_versions WHERE name = 'plans');
+INSERT INTO gym_data_versions (name, version)
+SELECT 'members', 0 WHERE NOT EXISTS (SELECT 1 FROM gym_data_versions WHERE name = 'members');
+INSERT INTO gym_data_versions (name, version)
+SELECT 'subscriptions', 0 WHERE NOT EXISTS (SELECT 1 FROM gym_data_versions WHERE name = 'subscriptions');
+INSERT INTO gym_data_versions (name, version)
+SELECT 'activity', 0 WHERE NOT EXISTS (SELECT 1 FROM gym_data_versions WHERE name = 'activity');
+INSERT INTO gym_data_versions (name, version)
+SELECT 'admins', 0 WHERE NOT EXISTS (SELECT 1 FROM gym_data_versions WHERE name = 'admins');
+
 INSERT INTO gym_plans (name, sessions_per_month, price, is_active)
 SELECT 'Plan Básico', 8, 80.00, TRUE
 WHERE NOT EXISTS (SELECT 1 FROM gym_plans WHERE name = 'Plan Básico');
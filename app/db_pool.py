@@ -0,0 +1,286 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(RuntimeError):
+    pass
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect,
+        min_size=0,
+        max_size=5,
+        max_idle=300,
+        max_lifetime=1800,
+        timeout=10,
+        check_after=30,
+        ping=None,
+        reset=None,
+    ):
+        if max_size < 1:
+            raise ValueError('max_size debe ser al menos 1.')
+        self.connect = connect
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.check_after = check_after
+        self.ping = ping
+        self.reset = reset
+        self.pid = os.getpid()
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()
+        self._born = {}
+        self._size = 0
+        self._closed = False
+        self.stats = {'created': 0, 'reused': 0, 'recycled': 0, 'failed_checks': 0, 'waits': 0}
+
+        for _ in range(self.min_size):
+            self._size += 1
+            conn = self._create()
+            self._idle.append((conn, time.monotonic()))
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle_count(self):
+        return len(self._idle)
+
+    def _create(self):
+        # El cupo ya se reservó al comprobar el tamaño; aquí solo se devuelve si falla la conexión.
+        try:
+            conn = self.connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self._born[id(conn)] = time.monotonic()
+        self.stats['created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        self._born.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _expired(self, conn, last_used, now):
+        if self.max_idle is not None and now - last_used > self.max_idle:
+            return True
+        born = self._born.get(id(conn), now)
+        return self.max_lifetime is not None and now - born > self.max_lifetime
+
+    def _healthy(self, conn, last_used, now):
+        if self.ping is None or now - last_used < self.check_after:
+            return True
+        try:
+            self.ping(conn)
+            return True
+        except Exception:
+            self.stats['failed_checks'] += 1
+            return False
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            candidate = None
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError('El pool de conexiones está cerrado.')
+                if self._idle:
+                    candidate = self._idle.pop()
+                elif self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout('No hay conexiones disponibles en el pool.')
+                    self.stats['waits'] += 1
+                    self._cond.wait(remaining)
+                    continue
+                else:
+                    self._size += 1
+
+            if candidate is None:
+                return self._create()
+
+            conn, last_used = candidate
+            now = time.monotonic()
+            if self._expired(conn, last_used, now):
+                self.stats['recycled'] += 1
+                self._discard(conn)
+                continue
+            if not self._healthy(conn, last_used, now):
+                self._discard(conn)
+                continue
+            self.stats['reused'] += 1
+            return conn
+
+    def release(self, conn, discard=False):
+        if conn is None:
+            return
+        if not discard and self.reset is not None:
+            try:
+                self.reset(conn)
+            except Exception:
+                discard = True
+
+        now = time.monotonic()
+        if discard or self._closed or self.max_idle == 0 or self._expired(conn, now, now):
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, now))
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._discard(conn)
+
+
+class AsyncConnectionPool:
+    def __init__(self, connect, max_size=10, max_idle=300, max_lifetime=1800, timeout=10, check_after=30, ping=None, reset=None):
+        if max_size < 1:
+            raise ValueError('max_size debe ser al menos 1.')
+        self.connect = connect
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.check_after = check_after
+        self.ping = ping
+        self.reset = reset
+        self.pid = os.getpid()
+
+        # Se usa desde un solo event loop; la condición solo despierta a quien espera un cupo.
+        self._cond = asyncio.Condition()
+        self._idle = deque()
+        self._born = {}
+        self._size = 0
+        self._closed = False
+        self.stats = {'created': 0, 'reused': 0, 'recycled': 0, 'failed_checks': 0, 'waits': 0}
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle_count(self):
+        return len(self._idle)
+
+    async def _notify(self):
+        async with self._cond:
+            self._cond.notify()
+
+    async def _create(self):
+        # El cupo ya se reservó en acquire.
+        try:
+            conn = await self.connect()
+        except Exception:
+            self._size -= 1
+            await self._notify()
+            raise
+        self._born[id(conn)] = time.monotonic()
+        self.stats['created'] += 1
+        return conn
+
+    async def _discard(self, conn):
+        self._born.pop(id(conn), None)
+        try:
+            await conn.close()
+        except Exception:
+            pass
+        self._size -= 1
+        await self._notify()
+
+    def _expired(self, conn, last_used, now):
+        if self.max_idle is not None and now - last_used > self.max_idle:
+            return True
+        born = self._born.get(id(conn), now)
+        return self.max_lifetime is not None and now - born > self.max_lifetime
+
+    async def _healthy(self, conn, last_used, now):
+        if self.ping is None or now - last_used < self.check_after:
+            return True
+        try:
+            await self.ping(conn)
+            return True
+        except Exception:
+            self.stats['failed_checks'] += 1
+            return False
+
+    async def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            async with self._cond:
+                if self._closed:
+                    raise RuntimeError('El pool de conexiones está cerrado.')
+                if not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout('No hay conexiones disponibles en el pool.')
+                    self.stats['waits'] += 1
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                candidate = self._idle.pop() if self._idle else None
+                if candidate is None:
+                    self._size += 1
+
+            if candidate is None:
+                return await self._create()
+
+            conn, last_used = candidate
+            now = time.monotonic()
+            if self._expired(conn, last_used, now):
+                self.stats['recycled'] += 1
+                await self._discard(conn)
+                continue
+            if not await self._healthy(conn, last_used, now):
+                await self._discard(conn)
+                continue
+            self.stats['reused'] += 1
+            return conn
+
+    async def release(self, conn, discard=False):
+        if conn is None:
+            return
+        if not discard and self.reset is not None:
+            try:
+                await self.reset(conn)
+            except Exception:
+                discard = True
+
+        now = time.monotonic()
+        if discard or self._closed or self.max_idle == 0 or self._expired(conn, now, now):
+            await self._discard(conn)
+            return
+
+        self._idle.append((conn, now))
+        await self._notify()
+
+    async def close(self):
+        self._closed = True
+        idle = list(self._idle)
+        self._idle.clear()
+        for conn, _ in idle:
+            await self._discard(conn)
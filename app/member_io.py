@@ -0,0 +1,134 @@
+import csv
+import io
+import os
+
+try:
+    import openpyxl
+except Exception:
+    openpyxl = None
+
+MEMBER_FIELDS = (
+    'full_name',
+    'document',
+    'phone',
+    'email',
+    'injuries',
+    'conditions_text',
+    'emergency_contact_name',
+    'emergency_contact_phone',
+)
+FIELD_LIMITS = {
+    'full_name': 180,
+    'document': 50,
+    'phone': 50,
+    'email': 120,
+    'emergency_contact_name': 180,
+    'emergency_contact_phone': 50,
+}
+EXPORT_COLUMNS = MEMBER_FIELDS + ('plan', 'status', 'remaining_sessions', 'end_date')
+FORMULA_PREFIXES = ('=', '+', '-', '@')
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def _clean(value):
+    if value is None:
+        return ''
+    text = str(value).strip()
+    if text.startswith("'") and text[1:2] in FORMULA_PREFIXES:
+        text = text[1:]
+    return text
+
+
+def _csv_rows(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(text, dialect)
+    yield from reader
+    text.detach()
+
+
+def _xlsx_rows(stream):
+    if openpyxl is None:
+        raise ImportFormatError('Falta instalar openpyxl para importar archivos .xlsx.')
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if value is None else value for value in row]
+    finally:
+        workbook.close()
+
+
+def read_member_rows(stream, filename=''):
+    extension = os.path.splitext(filename or '')[1].lower()
+    rows = _xlsx_rows(stream) if extension == '.xlsx' else _csv_rows(stream)
+
+    header = None
+    for line_number, row in enumerate(rows, start=1):
+        if header is None:
+            header = [_clean(name).lower() for name in row]
+            missing = {'full_name', 'document'} - set(header)
+            if missing or not ({'plan', 'plan_id'} & set(header)):
+                raise ImportFormatError(
+                    'El archivo debe incluir las columnas full_name, document y plan (nombre o id).'
+                )
+            continue
+        if not any(_clean(value) for value in row):
+            continue
+        yield line_number, {name: _clean(value) for name, value in zip(header, row) if name}
+
+
+def validate_member_row(raw, plans_by_key):
+    record = {field: raw.get(field, '') for field in MEMBER_FIELDS}
+    if not record['full_name'] or not record['document']:
+        return None, 'Nombre y documento son obligatorios.'
+    for field, limit in FIELD_LIMITS.items():
+        if len(record[field]) > limit:
+            return None, f'{field} supera {limit} caracteres.'
+
+    plan_key = raw.get('plan_id') or raw.get('plan', '')
+    plan = plans_by_key.get(plan_key.lower())
+    if not plan:
+        return None, f'Plan inválido o inactivo: {plan_key or "(vacío)"}.'
+    record['plan'] = plan
+    return record, None
+
+
+def plans_lookup(plans):
+    lookup = {}
+    for plan in plans:
+        lookup[str(plan['id'])] = plan
+        lookup[plan['name'].strip().lower()] = plan
+    return lookup
+
+
+def _safe_cell(value):
+    if value is None:
+        return ''
+    text = str(value)
+    # Evita que Excel interprete como fórmula un valor ingresado por el usuario.
+    if text.startswith(FORMULA_PREFIXES):
+        return f"'{text}"
+    return text
+
+
+def csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in batches:
+        for row in rows:
+            writer.writerow([_safe_cell(row.get(column)) for column in EXPORT_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
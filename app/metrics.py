@@ -0,0 +1,126 @@
+import re
+import threading
+from functools import lru_cache
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FINGERPRINT_MAX_LENGTH = 240
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|%\(\w+\)s|%s|\b\d+(?:\.\d+)?\b")
+_VALUE_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_REPEATED_LISTS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+
+
+@lru_cache(maxsize=1024)
+def sql_fingerprint(sql):
+    # Misma huella para la misma consulta sin importar valores ni largo de las listas IN/VALUES.
+    text = ' '.join(sql.split())
+    text = _LITERALS.sub('?', text)
+    text = _VALUE_LISTS.sub('(...)', text)
+    text = _REPEATED_LISTS.sub('(...)', text)
+    return text[:FINGERPRINT_MAX_LENGTH]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+            state[1] += 1
+            state[2] += value
+
+    def total_count(self):
+        with self._lock:
+            return sum(state[1] for state in self._values.values())
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(counts), count, total)) for key, (counts, count, total) in self._values.items()]
+        for key, (counts, count, total) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                labels = _format_labels(self.labels, key, [('le', _format_value(bound))])
+                yield f'{self.name}_bucket{labels} {bucket_count}'
+            yield f"{self.name}_bucket{_format_labels(self.labels, key, [('le', '+Inf')])} {count}"
+            yield f'{self.name}_count{_format_labels(self.labels, key)} {count}'
+            yield f'{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, description, labels=()):
+        metric = Counter(name, description, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, description, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, snapshot=()):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        # Los valores del pool y la caché se leen en el momento y no se guardan en el registro.
+        for name, kind, description, value in snapshot:
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,509 @@
+LOCK_NAME = 'unbroken_schema_migrations'
+LOCK_KEY = 728140511
+
+
+def scalar(cursor):
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    if isinstance(row, dict):
+        return next(iter(row.values()))
+    return row[0]
+
+
+def column_exists(cursor, engine, table, column):
+    if engine == 'postgres':
+        cursor.execute(
+            """
+            SELECT COUNT(*)
+            FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND table_name = %s
+              AND column_name = %s
+            """,
+            (table, column),
+        )
+    else:
+        cursor.execute(
+            """
+            SELECT COUNT(*)
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+              AND TABLE_NAME = %s
+              AND COLUMN_NAME = %s
+            """,
+            (table, column),
+        )
+    return scalar(cursor) > 0
+
+
+def table_exists(cursor, engine, table):
+    if engine == 'postgres':
+        cursor.execute(
+            """
+            SELECT COUNT(*)
+            FROM information_schema.tables
+            WHERE table_schema = current_schema()
+              AND table_name = %s
+            """,
+            (table,),
+        )
+    else:
+        cursor.execute(
+            """
+            SELECT COUNT(*)
+            FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE()
+              AND TABLE_NAME = %s
+            """,
+            (table,),
+        )
+    return scalar(cursor) > 0
+
+
+def create_index(cursor, engine, name, table, columns, unique=False):
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    if engine == 'postgres':
+        cursor.execute(f'CREATE {kind} IF NOT EXISTS {name} ON {table} ({columns})')
+        return
+
+    cursor.execute(
+        """
+        SELECT COUNT(*)
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE()
+          AND TABLE_NAME = %s
+          AND INDEX_NAME = %s
+        """,
+        (table, name),
+    )
+    if scalar(cursor) == 0:
+        cursor.execute(f'CREATE {kind} {name} ON {table} ({columns})')
+
+
+def _0001_base_tables(cursor, engine):
+    if engine == 'postgres':
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gym_plans (
+                id SERIAL PRIMARY KEY,
+                name VARCHAR(120) NOT NULL,
+                sessions_per_month INT NOT NULL,
+                price NUMERIC(10, 2) NOT NULL DEFAULT 0,
+                is_active BOOLEAN NOT NULL DEFAULT TRUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gym_members (
+                id SERIAL PRIMARY KEY,
+                full_name VARCHAR(180) NOT NULL,
+                document VARCHAR(50) NOT NULL UNIQUE,
+                phone VARCHAR(50),
+                email VARCHAR(120),
+                injuries TEXT,
+                conditions_text TEXT,
+                emergency_contact_name VARCHAR(180),
+                emergency_contact_phone VARCHAR(50),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gym_subscriptions (
+                id SERIAL PRIMARY KEY,
+                member_id INT NOT NULL,
+                plan_id INT NOT NULL,
+                start_date DATE NOT NULL,
+                end_date DATE NOT NULL,
+                remaining_sessions INT NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'active',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                CONSTRAINT fk_sub_member FOREIGN KEY (member_id) REFERENCES gym_members(id),
+                CONSTRAINT fk_sub_plan FOREIGN KEY (plan_id) REFERENCES gym_plans(id)
+            )
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gym_admins (
+                id SERIAL PRIMARY KEY,
+                username VARCHAR(120) NOT NULL UNIQUE,
+                password_hash VARCHAR(255) NOT NULL,
+                role VARCHAR(20) NOT NULL DEFAULT 'admin',
+                is_active BOOLEAN NOT NULL DEFAULT TRUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gym_session_logs (
+                id SERIAL PRIMARY KEY,
+                member_id INT NULL,
+                member_document VARCHAR(50),
+                member_name VARCHAR(180),
+                subscription_id INT NULL,
+                action VARCHAR(40) NOT NULL,
+                remaining_before INT NULL,
+                remaining_after INT NULL,
+                performed_by VARCHAR(120) NOT NULL,
+                performed_role VARCHAR(20) NOT NULL,
+                notes VARCHAR(255),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        cursor.execute("ALTER TABLE gym_admins ADD COLUMN IF NOT EXISTS role VARCHAR(20) NOT NULL DEFAULT 'admin'")
+    else:
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gym_plans (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                name VARCHAR(120) NOT NULL,
+                sessions_per_month INT NOT NULL,
+                price DECIMAL(10, 2) NOT NULL DEFAULT 0,
+                is_active TINYINT(1) NOT NULL DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gym_members (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                full_name VARCHAR(180) NOT NULL,
+                document VARCHAR(50) NOT NULL UNIQUE,
+                phone VARCHAR(50),
+                email VARCHAR(120),
+                injuries TEXT,
+                conditions_text TEXT,
+                emergency_contact_name VARCHAR(180),
+                emergency_contact_phone VARCHAR(50),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gym_subscriptions (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                member_id INT NOT NULL,
+                plan_id INT NOT NULL,
+                start_date DATE NOT NULL,
+                end_date DATE NOT NULL,
+                remaining_sessions INT NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'active',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                CONSTRAINT fk_sub_member FOREIGN KEY (member_id) REFERENCES gym_members(id),
+                CONSTRAINT fk_sub_plan FOREIGN KEY (plan_id) REFERENCES gym_plans(id)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gym_admins (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                username VARCHAR(120) NOT NULL UNIQUE,
+                password_hash VARCHAR(255) NOT NULL,
+                role VARCHAR(20) NOT NULL DEFAULT 'admin',
+                is_active TINYINT(1) NOT NULL DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gym_session_logs (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                member_id INT NULL,
+                member_document VARCHAR(50),
+                member_name VARCHAR(180),
+                subscription_id INT NULL,
+                action VARCHAR(40) NOT NULL,
+                remaining_before INT NULL,
+                remaining_after INT NULL,
+                performed_by VARCHAR(120) NOT NULL,
+                performed_role VARCHAR(20) NOT NULL,
+                notes VARCHAR(255),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """
+        )
+        if not column_exists(cursor, engine, 'gym_admins', 'role'):
+            cursor.execute("ALTER TABLE gym_admins ADD COLUMN role VARCHAR(20) NOT NULL DEFAULT 'admin' AFTER password_hash")
+
+    cursor.execute("UPDATE gym_admins SET role = 'admin' WHERE role IS NULL OR role = ''")
+    cursor.execute('SELECT COUNT(*) FROM gym_plans')
+    if scalar(cursor) == 0:
+        cursor.execute(
+            """
+            INSERT INTO gym_plans (name, sessions_per_month, price)
+            VALUES
+                ('Plan Básico', 8, 80.00),
+                ('Plan Intermedio', 12, 120.00),
+                ('Plan Full', 20, 180.00)
+            """
+        )
+
+
+def _0002_current_subscription_pointer(cursor, engine):
+    if column_exists(cursor, engine, 'gym_members', 'current_subscription_id'):
+        return
+
+    if engine == 'postgres':
+        cursor.execute('ALTER TABLE gym_members ADD COLUMN current_subscription_id INT NULL')
+    else:
+        cursor.execute('ALTER TABLE gym_members ADD COLUMN current_subscription_id INT NULL AFTER emergency_contact_phone')
+    cursor.execute(
+        """
+        UPDATE gym_members
+        SET current_subscription_id = (
+            SELECT MAX(gs.id)
+            FROM gym_subscriptions gs
+            WHERE gs.member_id = gym_members.id
+        )
+        """
+    )
+
+
+def _0003_hot_query_indexes(cursor, engine):
+    create_index(cursor, engine, 'idx_subscriptions_member_status', 'gym_subscriptions', 'member_id, status')
+    create_index(cursor, engine, 'idx_subscriptions_status_end_date', 'gym_subscriptions', 'status, end_date')
+    create_index(cursor, engine, 'idx_subscriptions_plan', 'gym_subscriptions', 'plan_id')
+    create_index(cursor, engine, 'idx_session_logs_action_created', 'gym_session_logs', 'action, created_at')
+    create_index(cursor, engine, 'idx_admins_role', 'gym_admins', 'role')
+
+
+def _0004_member_search_indexes(cursor, engine):
+    if engine == 'postgres':
+        create_index(cursor, engine, 'idx_members_document_prefix', 'gym_members', 'document varchar_pattern_ops')
+        create_index(cursor, engine, 'idx_members_name_prefix', 'gym_members', 'lower(full_name) text_pattern_ops')
+    else:
+        create_index(cursor, engine, 'idx_members_full_name', 'gym_members', 'full_name')
+
+
+def backfill_rollups(cursor, engine):
+    if engine == 'postgres':
+        month_start = "CAST(date_trunc('month', period_start) AS DATE)"
+    else:
+        month_start = "CAST(DATE_FORMAT(period_start, '%Y-%m-01') AS DATE)"
+
+    session_logs = 'SELECT action, created_at FROM gym_session_logs'
+    if table_exists(cursor, engine, 'gym_session_logs_archive'):
+        session_logs += ' UNION ALL SELECT action, created_at FROM gym_session_logs_archive'
+
+    cursor.execute('DELETE FROM gym_activity_rollups')
+    cursor.execute(
+        """
+        INSERT INTO gym_activity_rollups (period, period_start, metric, total)
+        SELECT 'day', CAST(created_at AS DATE), 'member_created', COUNT(*)
+        FROM gym_members
+        WHERE created_at IS NOT NULL
+        GROUP BY CAST(created_at AS DATE)
+        """
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO gym_activity_rollups (period, period_start, metric, total)
+        SELECT 'day', CAST(created_at AS DATE), action, COUNT(*)
+        FROM ({session_logs}) logs
+        WHERE created_at IS NOT NULL
+        GROUP BY CAST(created_at AS DATE), action
+        """
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO gym_activity_rollups (period, period_start, metric, total)
+        SELECT 'month', {month_start}, metric, SUM(total)
+        FROM gym_activity_rollups
+        WHERE period = 'day'
+        GROUP BY {month_start}, metric
+        """
+    )
+
+
+def _0005_activity_rollups(cursor, engine):
+    suffix = '' if engine == 'postgres' else ' ENGINE=InnoDB DEFAULT CHARSET=utf8mb4'
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS gym_activity_rollups (
+            period VARCHAR(5) NOT NULL,
+            period_start DATE NOT NULL,
+            metric VARCHAR(40) NOT NULL,
+            total INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, period_start, metric)
+        ){suffix}
+        """
+    )
+    backfill_rollups(cursor, engine)
+
+
+def _0006_session_log_client_ref(cursor, engine):
+    if not column_exists(cursor, engine, 'gym_session_logs', 'client_ref'):
+        cursor.execute('ALTER TABLE gym_session_logs ADD COLUMN client_ref VARCHAR(64) NULL')
+    create_index(cursor, engine, 'uq_session_logs_client_ref', 'gym_session_logs', 'client_ref', unique=True)
+
+
+def _0007_session_log_archive(cursor, engine):
+    suffix = '' if engine == 'postgres' else ' ENGINE=InnoDB DEFAULT CHARSET=utf8mb4'
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS gym_session_logs_archive (
+            id INT PRIMARY KEY,
+            member_id INT NULL,
+            member_document VARCHAR(50),
+            member_name VARCHAR(180),
+            subscription_id INT NULL,
+            action VARCHAR(40) NOT NULL,
+            remaining_before INT NULL,
+            remaining_after INT NULL,
+            performed_by VARCHAR(120) NOT NULL,
+            performed_role VARCHAR(20) NOT NULL,
+            notes VARCHAR(255),
+            client_ref VARCHAR(64) NULL,
+            created_at TIMESTAMP NULL,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ){suffix}
+        """
+    )
+    create_index(cursor, engine, 'idx_session_logs_archive_created', 'gym_session_logs_archive', 'created_at')
+    create_index(cursor, engine, 'idx_session_logs_created', 'gym_session_logs', 'created_at')
+
+
+def _0008_audit_indexes(cursor, engine):
+    for table, prefix in (('gym_session_logs', 'idx_session_logs'), ('gym_session_logs_archive', 'idx_session_logs_archive')):
+        create_index(cursor, engine, f'{prefix}_document', table, 'member_document, id')
+        create_index(cursor, engine, f'{prefix}_performed_by', table, 'performed_by, id')
+
+
+def _0009_admin_auth_epoch(cursor, engine):
+    if not column_exists(cursor, engine, 'gym_admins', 'auth_epoch'):
+        cursor.execute('ALTER TABLE gym_admins ADD COLUMN auth_epoch INT NOT NULL DEFAULT 0')
+
+
+DATA_VERSION_NAMES = ('plans', 'members', 'subscriptions', 'activity', 'admins')
+
+
+def _0010_data_versions(cursor, engine):
+    suffix = '' if engine == 'postgres' else ' ENGINE=InnoDB DEFAULT CHARSET=utf8mb4'
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS gym_data_versions (
+            name VARCHAR(40) PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ){suffix}
+        """
+    )
+    for name in DATA_VERSION_NAMES:
+        cursor.execute(
+            """
+            INSERT INTO gym_data_versions (name, version)
+            SELECT %s, 0
+            WHERE NOT EXISTS (SELECT 1 FROM gym_data_versions WHERE name = %s)
+            """,
+            (name, name),
+        )
+
+
+MIGRATIONS = [
+    (1, 'Tablas base y planes iniciales', _0001_base_tables),
+    (2, 'Puntero a la suscripción actual del miembro', _0002_current_subscription_pointer),
+    (3, 'Índices para las consultas frecuentes', _0003_hot_query_indexes),
+    (4, 'Índices para buscar miembros por prefijo', _0004_member_search_indexes),
+    (5, 'Agregados diarios y mensuales de actividad', _0005_activity_rollups),
+    (6, 'Referencia idempotente para ingresos sin conexión', _0006_session_log_client_ref),
+    (7, 'Archivo histórico del registro de sesiones', _0007_session_log_archive),
+    (8, 'Índices para la auditoría de sesiones', _0008_audit_indexes),
+    (9, 'Época de autenticación para revocar sesiones', _0009_admin_auth_epoch),
+    (10, 'Versiones de datos para respuestas condicionales', _0010_data_versions),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def ensure_version_table(cursor, engine):
+    if engine == 'postgres':
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                description VARCHAR(200) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+    else:
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                description VARCHAR(200) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """
+        )
+
+
+def applied_versions(cursor):
+    cursor.execute('SELECT version FROM schema_migrations ORDER BY version')
+    rows = cursor.fetchall()
+    return {row['version'] if isinstance(row, dict) else row[0] for row in rows}
+
+
+def _acquire_lock(cursor, engine):
+    if engine == 'postgres':
+        cursor.execute('SELECT pg_advisory_lock(%s)', (LOCK_KEY,))
+    else:
+        cursor.execute('SELECT GET_LOCK(%s, 60)', (LOCK_NAME,))
+        if scalar(cursor) != 1:
+            raise RuntimeError('No se pudo obtener el bloqueo de migraciones.')
+
+
+def _release_lock(cursor, engine):
+    if engine == 'postgres':
+        cursor.execute('SELECT pg_advisory_unlock(%s)', (LOCK_KEY,))
+    else:
+        cursor.execute('SELECT RELEASE_LOCK(%s)', (LOCK_NAME,))
+    cursor.fetchone()
+
+
+def upgrade(conn, engine, log=None):
+    cursor = conn.cursor()
+    applied_now = []
+    _acquire_lock(cursor, engine)
+    conn.commit()
+    try:
+        ensure_version_table(cursor, engine)
+        conn.commit()
+        done = applied_versions(cursor)
+        conn.commit()
+        for version, description, migrate in MIGRATIONS:
+            if version in done:
+                continue
+            if log:
+                log(f'Aplicando migración {version:04d}: {description}')
+            try:
+                migrate(cursor, engine)
+                cursor.execute(
+                    'INSERT INTO schema_migrations (version, description) VALUES (%s, %s)',
+                    (version, description),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied_now.append(version)
+    finally:
+        _release_lock(cursor, engine)
+        conn.commit()
+        cursor.close()
+    return applied_now
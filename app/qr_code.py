@@ -0,0 +1,327 @@
+import struct
+import zlib
+
+# Capacidad por versión (1-10) y nivel de corrección:
+# (codewords de corrección por bloque, [(bloques, codewords de datos por bloque), ...])
+EC_BLOCKS = {
+    'L': [
+        (7, [(1, 19)]), (10, [(1, 34)]), (15, [(1, 55)]), (20, [(1, 80)]), (26, [(1, 108)]),
+        (18, [(2, 68)]), (20, [(2, 78)]), (24, [(2, 97)]), (30, [(2, 116)]), (18, [(2, 68), (2, 69)]),
+    ],
+    'M': [
+        (10, [(1, 16)]), (16, [(1, 28)]), (26, [(1, 44)]), (18, [(2, 32)]), (24, [(2, 43)]),
+        (16, [(4, 27)]), (18, [(4, 31)]), (22, [(2, 38), (2, 39)]), (22, [(3, 36), (2, 37)]), (26, [(4, 43), (1, 44)]),
+    ],
+    'Q': [
+        (13, [(1, 13)]), (22, [(1, 22)]), (18, [(2, 17)]), (26, [(2, 24)]), (18, [(2, 15), (2, 16)]),
+        (24, [(4, 19)]), (18, [(2, 14), (4, 15)]), (22, [(4, 18), (2, 19)]), (20, [(4, 16), (4, 17)]), (24, [(6, 19), (2, 20)]),
+    ],
+    'H': [
+        (17, [(1, 9)]), (28, [(1, 16)]), (22, [(2, 13)]), (16, [(4, 9)]), (22, [(2, 11), (2, 12)]),
+        (28, [(4, 15)]), (26, [(4, 13), (1, 14)]), (26, [(4, 14), (2, 15)]), (24, [(4, 12), (4, 13)]), (28, [(6, 15), (2, 16)]),
+    ],
+}
+ALIGNMENT_POSITIONS = [
+    [], [6, 18], [6, 22], [6, 26], [6, 30], [6, 34], [6, 22, 38], [6, 24, 42], [6, 26, 46], [6, 28, 50],
+]
+FORMAT_EC_BITS = {'L': 1, 'M': 0, 'Q': 3, 'H': 2}
+MAX_VERSION = len(ALIGNMENT_POSITIONS)
+
+MASKS = [
+    lambda r, c: (r + c) % 2 == 0,
+    lambda r, c: r % 2 == 0,
+    lambda r, c: c % 3 == 0,
+    lambda r, c: (r + c) % 3 == 0,
+    lambda r, c: (r // 2 + c // 3) % 2 == 0,
+    lambda r, c: (r * c) % 2 + (r * c) % 3 == 0,
+    lambda r, c: ((r * c) % 2 + (r * c) % 3) % 2 == 0,
+    lambda r, c: ((r + c) % 2 + (r * c) % 3) % 2 == 0,
+]
+
+_EXP = [0] * 512
+_LOG = [0] * 256
+_value = 1
+for _power in range(255):
+    _EXP[_power] = _value
+    _LOG[_value] = _power
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= 0x11D
+for _power in range(255, 512):
+    _EXP[_power] = _EXP[_power - 255]
+
+
+class QRCodeError(ValueError):
+    pass
+
+
+def _rs_generator(degree):
+    poly = [1]
+    for power in range(degree):
+        poly = [
+            (poly[i] if i < len(poly) else 0) ^ (_gf_mul(poly[i - 1], _EXP[power]) if i > 0 else 0)
+            for i in range(len(poly) + 1)
+        ]
+    return poly
+
+
+def _gf_mul(a, b):
+    if a == 0 or b == 0:
+        return 0
+    return _EXP[_LOG[a] + _LOG[b]]
+
+
+def _rs_remainder(data, degree):
+    generator = _rs_generator(degree)
+    remainder = [0] * degree
+    for byte in data:
+        factor = byte ^ remainder[0]
+        remainder = remainder[1:] + [0]
+        for i in range(degree):
+            remainder[i] ^= _gf_mul(generator[i + 1], factor)
+    return remainder
+
+
+def _pick_version(length, level):
+    for version in range(1, MAX_VERSION + 1):
+        ec_size, groups = EC_BLOCKS[level][version - 1]
+        capacity = sum(blocks * size for blocks, size in groups)
+        count_bits = 8 if version < 10 else 16
+        if 4 + count_bits + length * 8 <= capacity * 8:
+            return version
+    raise QRCodeError('El texto es demasiado largo para el código QR.')
+
+
+def _codewords(payload, version, level):
+    ec_size, groups = EC_BLOCKS[level][version - 1]
+    capacity = sum(blocks * size for blocks, size in groups)
+    count_bits = 8 if version < 10 else 16
+
+    bits = [0, 1, 0, 0]
+    bits += [(len(payload) >> i) & 1 for i in range(count_bits - 1, -1, -1)]
+    for byte in payload:
+        bits += [(byte >> i) & 1 for i in range(7, -1, -1)]
+    bits += [0] * min(4, capacity * 8 - len(bits))
+    bits += [0] * (-len(bits) % 8)
+
+    data = [int(''.join(str(bit) for bit in bits[i:i + 8]), 2) for i in range(0, len(bits), 8)]
+    pad = 0
+    while len(data) < capacity:
+        data.append(0xEC if pad % 2 == 0 else 0x11)
+        pad += 1
+
+    blocks = []
+    offset = 0
+    for count, size in groups:
+        for _ in range(count):
+            block = data[offset:offset + size]
+            blocks.append((block, _rs_remainder(block, ec_size)))
+            offset += size
+
+    result = []
+    for i in range(max(len(block) for block, _ in blocks)):
+        result += [block[i] for block, _ in blocks if i < len(block)]
+    for i in range(ec_size):
+        result += [ec[i] for _, ec in blocks]
+    return result
+
+
+class _Matrix:
+    def __init__(self, version):
+        self.version = version
+        self.size = version * 4 + 17
+        self.modules = [[False] * self.size for _ in range(self.size)]
+        self.reserved = [[False] * self.size for _ in range(self.size)]
+
+    def set(self, row, col, dark):
+        self.modules[row][col] = dark
+        self.reserved[row][col] = True
+
+    def draw_function_patterns(self):
+        size = self.size
+        for i in range(size):
+            self.set(6, i, i % 2 == 0)
+            self.set(i, 6, i % 2 == 0)
+
+        for row, col in ((3, 3), (3, size - 4), (size - 4, 3)):
+            for dr in range(-4, 5):
+                for dc in range(-4, 5):
+                    r, c = row + dr, col + dc
+                    if 0 <= r < size and 0 <= c < size:
+                        self.set(r, c, max(abs(dr), abs(dc)) not in (2, 4))
+
+        positions = ALIGNMENT_POSITIONS[self.version - 1]
+        last = len(positions) - 1
+        for i, row in enumerate(positions):
+            for j, col in enumerate(positions):
+                if (i, j) in ((0, 0), (0, last), (last, 0)):
+                    continue
+                for dr in range(-2, 3):
+                    for dc in range(-2, 3):
+                        self.set(row + dr, col + dc, max(abs(dr), abs(dc)) != 1)
+
+        self.draw_format_bits('M', 0)
+        if self.version >= 7:
+            remainder = self.version
+            for _ in range(12):
+                remainder = (remainder << 1) ^ ((remainder >> 11) * 0x1F25)
+            bits = self.version << 12 | remainder
+            for i in range(18):
+                dark = (bits >> i) & 1 == 1
+                a, b = size - 11 + i % 3, i // 3
+                self.set(b, a, dark)
+                self.set(a, b, dark)
+
+    def draw_format_bits(self, level, mask):
+        size = self.size
+        data = FORMAT_EC_BITS[level] << 3 | mask
+        remainder = data
+        for _ in range(10):
+            remainder = (remainder << 1) ^ ((remainder >> 9) * 0x537)
+        bits = (data << 10 | remainder) ^ 0x5412
+
+        def bit(i):
+            return (bits >> i) & 1 == 1
+
+        for i in range(6):
+            self.set(i, 8, bit(i))
+        self.set(7, 8, bit(6))
+        self.set(8, 8, bit(7))
+        self.set(8, 7, bit(8))
+        for i in range(9, 15):
+            self.set(8, 14 - i, bit(i))
+        for i in range(8):
+            self.set(8, size - 1 - i, bit(i))
+        for i in range(8, 15):
+            self.set(size - 15 + i, 8, bit(i))
+        self.set(size - 8, 8, True)
+
+    def draw_codewords(self, codewords):
+        size = self.size
+        total_bits = len(codewords) * 8
+        index = 0
+        right = size - 1
+        while right >= 1:
+            if right == 6:
+                right = 5
+            upward = (right + 1) & 2 == 0
+            for vertical in range(size):
+                row = size - 1 - vertical if upward else vertical
+                for col in (right, right - 1):
+                    if self.reserved[row][col]:
+                        continue
+                    if index < total_bits:
+                        self.modules[row][col] = (codewords[index >> 3] >> (7 - (index & 7))) & 1 == 1
+                        index += 1
+            right -= 2
+
+    def apply_mask(self, mask):
+        check = MASKS[mask]
+        for row in range(self.size):
+            for col in range(self.size):
+                if not self.reserved[row][col] and check(row, col):
+                    self.modules[row][col] = not self.modules[row][col]
+
+
+def _penalty(modules):
+    size = len(modules)
+    score = 0
+    lines = modules + [list(column) for column in zip(*modules)]
+    finder = [True, False, True, True, True, False, True]
+    quiet = [False] * 4
+    for line in lines:
+        run = 1
+        for i in range(1, size):
+            if line[i] == line[i - 1]:
+                run += 1
+            else:
+                if run >= 5:
+                    score += run - 2
+                run = 1
+        if run >= 5:
+            score += run - 2
+
+        # El margen blanco del símbolo cuenta como zona clara alrededor del patrón.
+        padded = quiet + line + quiet
+        for i in range(4, size - 2):
+            if padded[i:i + 7] == finder and (not any(padded[i - 4:i]) or not any(padded[i + 7:i + 11])):
+                score += 40
+
+    for row in range(size - 1):
+        for col in range(size - 1):
+            color = modules[row][col]
+            if color == modules[row][col + 1] == modules[row + 1][col] == modules[row + 1][col + 1]:
+                score += 3
+
+    dark = sum(sum(1 for module in line if module) for line in modules)
+    total = size * size
+    score += abs(dark * 20 - total * 10) // total * 10
+    return score
+
+
+def qr_matrix(text, level='M', mask=None):
+    payload = text.encode('utf-8')
+    version = _pick_version(len(payload), level)
+    codewords = _codewords(payload, version, level)
+
+    best = None
+    for candidate in ([mask] if mask is not None else range(8)):
+        matrix = _Matrix(version)
+        matrix.draw_function_patterns()
+        matrix.draw_codewords(codewords)
+        matrix.apply_mask(candidate)
+        matrix.draw_format_bits(level, candidate)
+        score = _penalty(matrix.modules)
+        if best is None or score < best[0]:
+            best = (score, matrix.modules)
+    return best[1]
+
+
+def render_svg(modules, scale=8, border=4):
+    size = len(modules) + border * 2
+    path = []
+    for row, line in enumerate(modules):
+        col = 0
+        while col < len(line):
+            if not line[col]:
+                col += 1
+                continue
+            start = col
+            while col < len(line) and line[col]:
+                col += 1
+            path.append(f'M{start + border} {row + border}h{col - start}v1h-{col - start}z')
+    pixels = size * scale
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+        f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/>'
+        f'<path fill="#000" d="{"".join(path)}"/></svg>'
+    ).encode('utf-8')
+
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def render_png(modules, scale=8, border=4):
+    size = len(modules) + border * 2
+    pixels = size * scale
+    blank = [False] * border
+    raw = bytearray()
+    for line in [[False] * len(modules)] * border + modules + [[False] * len(modules)] * border:
+        bits = 0
+        for dark in blank + line + blank:
+            module = 0 if dark else 1
+            for _ in range(scale):
+                bits = bits << 1 | module
+        padding = -pixels % 8
+        row = b'\x00' + (bits << padding).to_bytes((pixels + padding) // 8, 'big')
+        raw += row * scale
+
+    header = struct.pack('>IIBBBBB', pixels, pixels, 1, 0, 0, 0, 0)
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        _png_chunk(b'IHDR', header),
+        _png_chunk(b'IDAT', zlib.compress(bytes(raw), 9)),
+        _png_chunk(b'IEND', b''),
+    ])
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except Exception:
+    redis = None
+
+
+class MemoryBucketStore:
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill_rate, cost, now):
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed, tokens
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class RedisBucketStore:
+    # El cálculo se hace en el servidor para que varias instancias compartan el mismo cubo.
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local refill_rate = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local now = tonumber(ARGV[4])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+    local tokens = tonumber(state[1]) or capacity
+    local updated_at = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated_at) * refill_rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill_rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url, prefix='unbroken:ratelimit:'):
+        if redis is None:
+            raise RuntimeError('Falta instalar redis para usar LOGIN_RATE_LIMIT_BACKEND=redis.')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._take = self.client.register_script(self.SCRIPT)
+
+    def take(self, key, capacity, refill_rate, cost, now):
+        allowed, tokens = self._take(keys=[self.prefix + key], args=[capacity, refill_rate, cost, now])
+        return bool(allowed), float(tokens)
+
+    def reset(self, key):
+        self.client.delete(self.prefix + key)
+
+
+class TokenBucket:
+    def __init__(self, store, capacity, period):
+        self.store = store
+        self.capacity = capacity
+        self.refill_rate = capacity / period
+
+    def consume(self, key, cost=1):
+        allowed, tokens = self.store.take(key, self.capacity, self.refill_rate, cost, time.time())
+        retry_after = 0 if allowed else (cost - tokens) / self.refill_rate
+        return allowed, retry_after
+
+    def reset(self, key):
+        self.store.reset(key)
@@ -1,3 +1,28 @@
+const loadedScripts = {};
+
+// Carga una librería solo cuando la página la necesita; varias llamadas comparten la misma promesa.
+window.loadScript = (src, integrity) => {
+	if (!loadedScripts[src]) {
+		loadedScripts[src] = new Promise((resolve, reject) => {
+			const script = document.createElement('script');
+			script.src = src;
+			script.async = true;
+			if (integrity) {
+				script.integrity = integrity;
+				script.crossOrigin = 'anonymous';
+			}
+			script.onload = () => resolve();
+			script.onerror = () => {
+				delete loadedScripts[src];
+				script.remove();
+				reject(new Error(`No se pudo cargar ${src}`));
+			};
+			document.head.appendChild(script);
+		});
+	}
+	return loadedScripts[src];
+};
+
 document.addEventListener('DOMContentLoaded', () => {
 	const themeToggle = document.getElementById('themeToggle');
 	const themeKey = 'unbroken-theme';
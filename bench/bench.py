@@ -0,0 +1,396 @@
+import itertools
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import click
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT_DIR, 'app')
+BENCH_PREFIX = 'BENCH-'
+BENCH_PERFORMER = 'bench-seed'
+SECONDS_PER_YEAR = 365 * 86400
+
+
+def load_app(cache=True):
+    # La configuración se lee al importar la aplicación: se fija antes del import.
+    os.environ['LOGIN_RATE_LIMIT_BACKEND'] = 'none'
+    os.environ['EXPIRY_SCHEDULER'] = '0'
+    os.environ['METRICS_ENABLED'] = '1'
+    if not cache:
+        os.environ['CACHE_BACKEND'] = 'none'
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+    import app as app_module
+
+    return app_module
+
+
+def bench_document(number):
+    return f'{BENCH_PREFIX}{number:08d}'
+
+
+def document_sql(expr, engine):
+    cast = 'TEXT' if engine == 'postgres' else 'CHAR'
+    return f"CONCAT('{BENCH_PREFIX}', LPAD(CAST({expr} AS {cast}), 8, '0'))"
+
+
+def series_sql(engine):
+    if engine == 'postgres':
+        return 'SELECT n FROM generate_series(CAST(%s AS BIGINT), CAST(%s AS BIGINT)) AS numbers (n)'
+    return 'WITH RECURSIVE numbers (n) AS (SELECT %s UNION ALL SELECT n + 1 FROM numbers WHERE n < %s) SELECT n FROM numbers'
+
+
+def seconds_ago_sql(expr, engine):
+    if engine == 'postgres':
+        return f"CURRENT_TIMESTAMP - ({expr}) * INTERVAL '1 second'"
+    return f'CURRENT_TIMESTAMP - INTERVAL ({expr}) SECOND'
+
+
+def insert_series(app_module, sql, first, last, chunk_size, label):
+    engine = app_module.app.config['DB_ENGINE']
+    inserted = 0
+    for start in range(first, last + 1, chunk_size):
+        end = min(start + chunk_size - 1, last)
+        with app_module.transaction() as conn:
+            cursor = conn.cursor()
+            if engine != 'postgres':
+                cursor.execute('SET SESSION cte_max_recursion_depth = %s', (end - start + 10,))
+            cursor.execute(sql, (start, end))
+            inserted += cursor.rowcount or 0
+            cursor.close()
+        click.echo(f'  {label}: {end - first + 1}/{last - first + 1}')
+    return inserted
+
+
+def seed_members(app_module, total, chunk_size):
+    engine = app_module.app.config['DB_ENGINE']
+    existing = app_module.query_one(
+        'SELECT COUNT(*) AS total FROM gym_members WHERE document LIKE %s', (f'{BENCH_PREFIX}%',)
+    )['total']
+    if existing < total:
+        spacing = SECONDS_PER_YEAR / total
+        insert_series(
+            app_module,
+            f"""
+            INSERT INTO gym_members (full_name, document, phone, email, created_at)
+            SELECT CONCAT('Bench member ', n), {document_sql('n', engine)},
+                   CONCAT('300', LPAD(CAST(n AS {'TEXT' if engine == 'postgres' else 'CHAR'}), 7, '0')),
+                   CONCAT('bench', n, '@example.com'),
+                   {seconds_ago_sql(f'({total} - n) * {spacing:.6f}', engine)}
+            FROM ({series_sql(engine)}) AS numbers
+            """,
+            existing + 1,
+            total,
+            chunk_size,
+            'miembros',
+        )
+
+    plans = [plan['id'] for plan in app_module.query_all('SELECT id FROM gym_plans ORDER BY id')]
+    if not plans:
+        raise click.ClickException('No hay planes. Ejecuta "flask db upgrade" primero.')
+    plan_case = 'CASE MOD(m.id, %d) %s END' % (
+        len(plans),
+        ' '.join(f'WHEN {index} THEN {plan_id}' for index, plan_id in enumerate(plans)),
+    )
+    # Sesiones de sobra para que los ingresos del benchmark nunca agoten el plan.
+    with app_module.transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            INSERT INTO gym_subscriptions (member_id, plan_id, start_date, end_date, remaining_sessions, status)
+            SELECT m.id, {plan_case}, %s, %s, 1000000, 'active'
+            FROM gym_members m
+            WHERE m.document LIKE %s AND m.current_subscription_id IS NULL
+            """,
+            (date.today(), date.today() + timedelta(days=365), f'{BENCH_PREFIX}%'),
+        )
+        if engine == 'postgres':
+            cursor.execute(
+                """
+                UPDATE gym_members m
+                SET current_subscription_id = s.id
+                FROM gym_subscriptions s
+                WHERE s.member_id = m.id AND m.current_subscription_id IS NULL AND m.document LIKE %s
+                """,
+                (f'{BENCH_PREFIX}%',),
+            )
+        else:
+            cursor.execute(
+                """
+                UPDATE gym_members m
+                JOIN gym_subscriptions s ON s.member_id = m.id
+                SET m.current_subscription_id = s.id
+                WHERE m.current_subscription_id IS NULL AND m.document LIKE %s
+                """,
+                (f'{BENCH_PREFIX}%',),
+            )
+        cursor.close()
+    return max(total - existing, 0)
+
+
+def seed_session_logs(app_module, total, members, chunk_size):
+    engine = app_module.app.config['DB_ENGINE']
+    existing = app_module.query_one(
+        'SELECT COUNT(*) AS total FROM gym_session_logs WHERE performed_by = %s', (BENCH_PERFORMER,)
+    )['total']
+    if existing >= total:
+        return 0
+    spacing = SECONDS_PER_YEAR / total
+    return insert_series(
+        app_module,
+        f"""
+        INSERT INTO gym_session_logs
+        (member_id, member_document, member_name, subscription_id, action,
+         remaining_before, remaining_after, performed_by, performed_role, notes, created_at)
+        SELECT m.id, m.document, m.full_name, m.current_subscription_id, 'session_discount',
+               1000000, 999999, '{BENCH_PERFORMER}', 'staff', 'bench',
+               {seconds_ago_sql(f'({total} - n) * {spacing:.6f}', engine)}
+        FROM ({series_sql(engine)}) AS numbers
+        JOIN gym_members m ON m.document = {document_sql(f'MOD(n, {members}) + 1', engine)}
+        """,
+        existing + 1,
+        total,
+        chunk_size,
+        'registros de sesión',
+    )
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return ''
+
+
+def scenario_checkin(client, rng, members):
+    return client.post('/api/checkin', json={'document': bench_document(rng.randint(1, members))})
+
+
+def scenario_dashboard(client, rng, members):
+    return client.get('/dashboard')
+
+
+def scenario_members(client, rng, members):
+    return client.get('/members')
+
+
+def scenario_members_search(client, rng, members):
+    return client.get('/members', query_string={'q': bench_document(rng.randint(1, members))[:-2]})
+
+
+def scenario_audit(client, rng, members):
+    return client.get('/audit', query_string={'document': bench_document(rng.randint(1, members))})
+
+
+SCENARIOS = {
+    'checkin': scenario_checkin,
+    'dashboard': scenario_dashboard,
+    'members': scenario_members,
+    'members-search': scenario_members_search,
+    'audit': scenario_audit,
+}
+
+
+def logged_in_client(app_module):
+    client = app_module.app.test_client()
+    response = client.post(
+        '/login', data={'username': app_module.ADMIN_USER, 'password': app_module.ADMIN_PASSWORD}
+    )
+    if response.status_code != 302 or not client.get('/dashboard').status_code == 200:
+        raise click.ClickException('No se pudo iniciar sesión con ADMIN_USER/ADMIN_PASSWORD.')
+    return client
+
+
+def run_scenario(app_module, name, clients, total, members, seed):
+    action = SCENARIOS[name]
+    counter = itertools.count()
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        client = clients[index]
+        latencies = []
+        failures = 0
+        while next(counter) < total:
+            started = time.perf_counter()
+            response = action(client, rng, members)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                failures += 1
+            response.close()
+        return latencies, failures
+
+    queries_before = app_module.QUERY_DURATION.total_count()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        results = list(pool.map(worker, range(len(clients))))
+    elapsed = time.perf_counter() - started
+    queries = app_module.QUERY_DURATION.total_count() - queries_before
+
+    latencies = sorted(value for values, _ in results for value in values)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': sum(failures for _, failures in results),
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(count / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0,
+        'queries_per_request': round(queries / count, 2) if count else 0,
+    }
+
+
+def print_results(results):
+    click.echo(f"{'escenario':<16}{'req':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'q/req':>8}")
+    for name, row in results.items():
+        click.echo(
+            f"{name:<16}{row['requests']:>8}{row['errors']:>6}{row['throughput_rps']:>9}"
+            f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['queries_per_request']:>8}"
+        )
+
+
+@click.group()
+def cli():
+    """Benchmark de ingresos, panel y listado de miembros contra una base local."""
+
+
+@cli.command('seed')
+@click.option('--members', type=int, default=50000, show_default=True, help='Miembros sintéticos.')
+@click.option('--logs', type=int, default=500000, show_default=True, help='Registros de sesión sintéticos.')
+@click.option('--chunk-size', type=int, default=100000, show_default=True, help='Filas por transacción.')
+@click.option('--yes', is_flag=True, help='No pedir confirmación.')
+def seed_command(members, logs, chunk_size, yes):
+    """Carga miembros, suscripciones y registros de sesión sintéticos (documentos BENCH-...)."""
+    app_module = load_app()
+    config = app_module.app.config
+    if not yes:
+        click.confirm(f"Se cargarán datos de prueba en la base {config['DB_ENGINE']} configurada. ¿Continuar?", abort=True)
+
+    with app_module.app.app_context():
+        app_module.ensure_schema()
+        started = time.perf_counter()
+        created = seed_members(app_module, members, chunk_size)
+        click.echo(f'Miembros nuevos: {created} ({time.perf_counter() - started:.1f} s).')
+
+        started = time.perf_counter()
+        inserted = seed_session_logs(app_module, logs, members, chunk_size)
+        click.echo(f'Registros de sesión nuevos: {inserted} ({time.perf_counter() - started:.1f} s).')
+
+        started = time.perf_counter()
+        with app_module.transaction() as conn:
+            cursor = conn.cursor()
+            app_module.migrations.backfill_rollups(cursor, config['DB_ENGINE'])
+            if config['DB_ENGINE'] == 'postgres':
+                cursor.execute('ANALYZE')
+            cursor.close()
+        click.echo(f'Agregados recalculados ({time.perf_counter() - started:.1f} s).')
+
+
+@cli.command('reset')
+@click.option('--yes', is_flag=True, help='No pedir confirmación.')
+def reset_command(yes):
+    """Elimina los datos sintéticos cargados por seed y los ingresos registrados sobre ellos."""
+    app_module = load_app()
+    if not yes:
+        click.confirm('Se eliminarán los miembros BENCH-... y sus registros. ¿Continuar?', abort=True)
+    pattern = f'{BENCH_PREFIX}%'
+    with app_module.app.app_context():
+        with app_module.transaction() as conn:
+            cursor = conn.cursor()
+            for table in ('gym_session_logs', 'gym_session_logs_archive'):
+                cursor.execute(f'DELETE FROM {table} WHERE member_document LIKE %s', (pattern,))
+            cursor.execute('UPDATE gym_members SET current_subscription_id = NULL WHERE document LIKE %s', (pattern,))
+            cursor.execute(
+                'DELETE FROM gym_subscriptions WHERE member_id IN (SELECT id FROM gym_members WHERE document LIKE %s)',
+                (pattern,),
+            )
+            cursor.execute('DELETE FROM gym_members WHERE document LIKE %s', (pattern,))
+            app_module.migrations.backfill_rollups(cursor, app_module.app.config['DB_ENGINE'])
+            cursor.close()
+        app_module.invalidate_cache('members', 'subscriptions', 'activity')
+    click.echo('Datos de benchmark eliminados.')
+
+
+@cli.command('run')
+@click.option(
+    '--scenario', 'scenarios', type=click.Choice(sorted(SCENARIOS)), multiple=True,
+    help='Escenarios a ejecutar (por defecto todos).',
+)
+@click.option('--requests', 'total', type=int, default=1000, show_default=True, help='Peticiones por escenario.')
+@click.option('--concurrency', type=int, default=8, show_default=True, help='Clientes en paralelo.')
+@click.option('--warmup', type=int, default=50, show_default=True, help='Peticiones descartadas antes de medir.')
+@click.option('--seed', type=int, default=1, show_default=True, help='Semilla de los documentos elegidos.')
+@click.option('--no-cache', is_flag=True, help='Desactiva la caché de la aplicación.')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Guarda el resultado en JSON.')
+def run_command(scenarios, total, concurrency, warmup, seed, no_cache, output):
+    """Mide latencia (p50/p95/p99), rendimiento y consultas por petición con el cliente de pruebas de Flask."""
+    app_module = load_app(cache=not no_cache)
+    with app_module.app.app_context():
+        members = app_module.query_one(
+            'SELECT COUNT(*) AS total FROM gym_members WHERE document LIKE %s', (f'{BENCH_PREFIX}%',)
+        )['total']
+        session_logs = app_module.query_one('SELECT COUNT(*) AS total FROM gym_session_logs')['total']
+    if not members:
+        raise click.ClickException('No hay datos de benchmark. Ejecuta primero: python bench/bench.py seed')
+
+    clients = [logged_in_client(app_module) for _ in range(concurrency)]
+    results = {}
+    for name in scenarios or sorted(SCENARIOS):
+        if warmup:
+            run_scenario(app_module, name, clients, warmup, members, seed + 1000)
+        results[name] = run_scenario(app_module, name, clients, total, members, seed)
+    print_results(results)
+
+    if output:
+        report = {
+            'revision': git_revision(),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'engine': app_module.app.config['DB_ENGINE'],
+            'dataset': {'members': members, 'session_logs': session_logs},
+            'params': {'requests': total, 'concurrency': concurrency, 'warmup': warmup, 'cache': not no_cache},
+            'results': results,
+        }
+        with open(output, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2)
+        click.echo(f'Resultado guardado en {output}.')
+
+
+@cli.command('compare')
+@click.argument('baseline', type=click.Path(exists=True, dir_okay=False))
+@click.argument('candidate', type=click.Path(exists=True, dir_okay=False))
+def compare_command(baseline, candidate):
+    """Compara dos resultados guardados con --output (por ejemplo de dos commits)."""
+    with open(baseline, encoding='utf-8') as handle:
+        before = json.load(handle)
+    with open(candidate, encoding='utf-8') as handle:
+        after = json.load(handle)
+    click.echo(f"{before.get('revision') or baseline} -> {after.get('revision') or candidate}")
+    click.echo(f"{'escenario':<16}{'métrica':<20}{'antes':>10}{'después':>10}{'cambio':>9}")
+    for name, row in after['results'].items():
+        previous = before['results'].get(name)
+        if not previous:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'queries_per_request'):
+            old, new = previous[metric], row[metric]
+            change = f'{(new - old) / old * 100:+.1f}%' if old else '-'
+            click.echo(f'{name:<16}{metric:<20}{old:>10}{new:>10}{change:>9}')
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+import pytest
+
+import app as web
+import asgi
+
+
+@pytest.fixture
+def asgi_app(monkeypatch):
+    monkeypatch.setitem(web.app.config, 'SCHEMA_READY', True)
+    monkeypatch.setitem(web.app.config, 'EXPIRY_SCHEDULER', False)
+    monkeypatch.setitem(web.app.config, 'QUERY_BUDGET_MODE', 'off')
+    return web.app
+
+
+def environ_for(path, headers=()):
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': list(headers)}
+    return asgi.build_environ(scope, b'')
+
+
+def test_flask_hooks_run_off_the_event_loop(asgi_app, monkeypatch):
+    threads = {}
+
+    def record(name, function):
+        def wrapped(*args, **kwargs):
+            threads[name] = threading.current_thread()
+            return function(*args, **kwargs)
+
+        monkeypatch.setattr(asgi_app, name, wrapped)
+
+    for name in ('preprocess_request', 'finalize_request', 'do_teardown_request'):
+        record(name, getattr(asgi_app, name))
+
+    async def view():
+        threads['view'] = threading.current_thread()
+        return web.request.path
+
+    async def run():
+        threads['loop'] = threading.current_thread()
+        return await asgi.dispatch_async(environ_for('/dashboard'), view)
+
+    status, _, body = asyncio.run(run())
+    assert (status, body) == (200, b'/dashboard')
+    assert threads['view'] is threads['loop']
+    for name in ('preprocess_request', 'finalize_request', 'do_teardown_request'):
+        assert threads[name] is not threads['loop'], name
+
+
+def test_split_cookie_headers_keep_the_session(asgi_app):
+    session_cookie = asgi_app.session_interface.get_signing_serializer(asgi_app).dumps(
+        {'is_authenticated': True, 'admin_user': web.ADMIN_USER, 'user_role': 'admin', 'is_admin': True}
+    )
+    cookie_name = asgi_app.config['SESSION_COOKIE_NAME']
+    headers = [
+        (b'cookie', f'{cookie_name}={session_cookie}'.encode()),
+        (b'cookie', b'theme=dark'),
+        (b'content-type', b'application/json'),
+    ]
+    assert environ_for('/', headers)['HTTP_COOKIE'] == f'{cookie_name}={session_cookie}; theme=dark'
+
+    body = b'{"scans": []}'
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/api/checkin/sync', 'query_string': b'', 'headers': headers}
+    asyncio.run(asgi.asgi_app(scope, receive, send))
+    # Con la sesión leída la ruta valida el lote (400); sin ella respondería 401.
+    assert sent[0]['status'] == 400
@@ -0,0 +1,65 @@
+import json
+import os
+
+import pytest
+
+import app as web
+from assets import VENDOR_ASSETS, VENDOR_LOCK_FILE, AssetManifest, subresource_integrity
+
+
+@pytest.fixture
+def vendor_static(tmp_path):
+    lock = {}
+    for name, (filename, url) in VENDOR_ASSETS.items():
+        content = f'/* {name} */'.encode()
+        path = tmp_path / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        lock[name] = {'file': filename, 'url': url, 'integrity': subresource_integrity(content)}
+    (tmp_path / VENDOR_LOCK_FILE).write_text(json.dumps(lock))
+    return tmp_path
+
+
+def test_asset_url_resolves_to_local_fingerprinted_file():
+    with web.app.test_request_context():
+        url = web.asset_url('css/layout.css')
+    assert url.startswith('/assets/css/layout.')
+    source = web.asset_manifest.resolve(url.rsplit('/assets/', 1)[1])
+    assert source == 'css/layout.css'
+    assert os.path.isfile(os.path.join(web.app.static_folder, source))
+
+
+def test_vendor_url_uses_local_copy_with_integrity(vendor_static, monkeypatch):
+    monkeypatch.setattr(web, 'asset_manifest', AssetManifest(str(vendor_static)))
+    with web.app.test_request_context():
+        for name, (filename, url) in VENDOR_ASSETS.items():
+            local = web.vendor_url(name)
+            assert local.startswith('/assets/vendor/')
+            assert url not in local
+            assert web.vendor_integrity(name).startswith('sha384-')
+    assert web.asset_manifest.missing_vendor_files() == []
+
+
+def test_tampered_vendor_file_is_reported(vendor_static):
+    filename = VENDOR_ASSETS['chart.js'][0]
+    (vendor_static / filename).write_bytes(b'otro contenido')
+    assert AssetManifest(str(vendor_static)).missing_vendor_files() == ['chart.js']
+
+
+def test_missing_vendor_file_falls_back_to_pinned_cdn(vendor_static, monkeypatch):
+    (vendor_static / VENDOR_ASSETS['chart.js'][0]).unlink()
+    monkeypatch.setattr(web, 'asset_manifest', AssetManifest(str(vendor_static)))
+    monkeypatch.setitem(web.app.config, 'VENDOR_CDN_FALLBACK', True)
+    with web.app.test_request_context():
+        url = web.vendor_url('chart.js')
+        integrity = web.vendor_integrity('chart.js')
+    assert url == VENDOR_ASSETS['chart.js'][1]
+    assert integrity == subresource_integrity(b'/* chart.js */')
+
+
+def test_cdn_fallback_can_be_disabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(web, 'asset_manifest', AssetManifest(str(tmp_path)))
+    monkeypatch.setitem(web.app.config, 'VENDOR_CDN_FALLBACK', False)
+    with web.app.test_request_context():
+        url = web.vendor_url('chart.js')
+    assert url == '/static/' + VENDOR_ASSETS['chart.js'][0]
@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+import app as web
+
+
+@pytest.fixture
+def budget_app(monkeypatch):
+    monkeypatch.setitem(web.app.config, 'QUERY_BUDGET_MODE', 'raise')
+    monkeypatch.setitem(web.app.config, 'QUERY_REPEAT_LIMIT', 3)
+    monkeypatch.setitem(web.app.config, 'SCHEMA_READY', True)
+    monkeypatch.setitem(web.app.config, 'EXPIRY_SCHEDULER', False)
+    monkeypatch.setitem(web.app.config, 'METRICS_ENABLED', False)
+    return web.app
+
+
+def run_queries(sql, times):
+    for _ in range(times):
+        web.observe_query(sql, time.perf_counter(), 1)
+
+
+def test_repeated_query_is_reported_as_n_plus_one():
+    log = [('SELECT * FROM gym_members WHERE id = ?', 0.001)] * 3
+    problems, duplicates = web.query_budget_problems(log, budget=0)
+    assert problems and 'N+1' in problems[0]
+    assert duplicates == {'SELECT * FROM gym_members WHERE id = ?': 3}
+
+
+def test_allow_repeats_keeps_the_limit():
+    log = [('UPDATE gym_subscriptions SET status = ?', 0.001)] * 5
+    assert web.query_budget_problems(log, budget=0, allow_repeats=True) == ([], {})
+    problems, _ = web.query_budget_problems(log, budget=4, allow_repeats=True)
+    assert problems == ['5 consultas con un presupuesto de 4']
+
+
+def test_n_plus_one_in_a_regular_view_raises(budget_app):
+    with budget_app.test_request_context('/api/checkin', method='POST'):
+        run_queries('SELECT id FROM gym_members WHERE document = %s', 3)
+        with pytest.raises(web.QueryBudgetExceeded, match='N\\+1'):
+            web.check_query_budget(budget_app.response_class())
+
+
+@pytest.mark.parametrize(
+    'path, method',
+    [
+        ('/api/checkin/sync', 'POST'),
+        ('/members/import', 'POST'),
+        ('/api/tasks/expire-subscriptions', 'POST'),
+    ],
+)
+def test_batch_views_may_repeat_queries(budget_app, path, method):
+    with budget_app.test_request_context(path, method=method):
+        run_queries('UPDATE gym_subscriptions SET remaining_sessions = remaining_sessions - 1 WHERE id = %s', 10)
+        response = web.check_query_budget(budget_app.response_class())
+    assert response.headers['X-Query-Count'] == '10'
+
+
+def test_checkin_sync_with_several_scans_passes_the_budget(budget_app, monkeypatch):
+    def fake_check_in(document, performed_by, performed_role, client_ref=None, notes=None):
+        run_queries('SELECT id FROM gym_members WHERE document = %s', 1)
+        return {'ok': True, 'code': 'ok', 'member_name': document, 'remaining': 1}
+
+    monkeypatch.setattr(web, 'check_in_member', fake_check_in)
+    client = budget_app.test_client()
+    with client.session_transaction() as session:
+        session['is_authenticated'] = True
+        session['admin_user'] = web.ADMIN_USER
+        session['role'] = 'admin'
+    scans = [{'client_ref': f'ref-{index}', 'document': f'D{index}'} for index in range(4)]
+    response = client.post('/api/checkin/sync', json={'scans': scans})
+    assert response.status_code == 200
+    assert response.headers['X-Query-Count'] == '4'
+    assert [item['status'] for item in response.get_json()['results']] == ['applied'] * 4